@@ -1,10 +1,17 @@
 import os
+import queue
 import sqlite3
-from datetime import date, datetime
-from typing import Dict, Tuple, Any, Optional, List
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Tuple, Any, Optional, List, Iterable, Iterator
 import pandas as pd
 
-from .storage import sync_db_to_r2
+from .storage import upload_to_r2, is_r2_enabled
 
 # Support either local SQLite or Postgres via DATABASE_URL (Heroku)
 DB_PATH = "attendance.db"
@@ -17,21 +24,349 @@ psycopg2 = None  # type: ignore
 if DATABASE_URL:
     try:
         import psycopg2 as _psycopg2  # type: ignore
+        import psycopg2.extensions  # type: ignore
+        import psycopg2.extras  # type: ignore
+        import psycopg2.pool  # type: ignore
         psycopg2 = _psycopg2
         USE_POSTGRES = True
         PG_DSN = DATABASE_URL
     except ImportError:
         USE_POSTGRES = False
 
+# SQLite uses one writer connection plus a small pool of read-only
+# connections. Under WAL, readers don't block the writer (or each other),
+# which a single shared connection behind one lock would force them to.
+# PRAGMAs are applied once per connection when it is opened; journal_mode
+# and synchronous only matter for (and can only be set by) the writer.
+SQLITE_WRITER_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+)
+SQLITE_PRAGMAS = (
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA busy_timeout=5000",
+)
+SQLITE_MAX_READERS = os.cpu_count() or 4
+
+_sqlite_writer: Optional[sqlite3.Connection] = None
+_sqlite_write_lock = threading.Lock()
+_sqlite_readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+_sqlite_readers_opened = 0
+_sqlite_readers_lock = threading.Lock()
+_pg_pool = None
+
+
+def _get_sqlite_writer() -> sqlite3.Connection:
+    """Get or create the process-wide SQLite writer connection.
+
+    Opened lazily (not at import) so that a database downloaded from R2 on
+    startup is the file that ends up being used.
+    """
+    global _sqlite_writer
+    if _sqlite_writer is None:
+        with _sqlite_write_lock:
+            if _sqlite_writer is None:
+                con = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+                for pragma in SQLITE_WRITER_PRAGMAS + SQLITE_PRAGMAS:
+                    con.execute(pragma)
+                # Queries bind justification dates as ordinals, which never match
+                # the old TEXT rows: migrate before the connection is handed out,
+                # so a DB that skipped init_db() can't silently read as empty.
+                con.execute("BEGIN IMMEDIATE")
+                try:
+                    _migrate_sqlite_justification_dates(con.cursor())
+                except BaseException:
+                    con.execute("ROLLBACK")
+                    raise
+                con.execute("COMMIT")
+                _sqlite_writer = con
+    return _sqlite_writer
+
+
+def _checkout_sqlite_reader() -> sqlite3.Connection:
+    """Take an idle reader from the pool, opening a new one while under the limit."""
+    global _sqlite_readers_opened
+    try:
+        return _sqlite_readers.get_nowait()
+    except queue.Empty:
+        pass
+    with _sqlite_readers_lock:
+        can_open = _sqlite_readers_opened < SQLITE_MAX_READERS
+        if can_open:
+            _sqlite_readers_opened += 1
+    if not can_open:
+        return _sqlite_readers.get()
+    # The writer creates the file and switches it to WAL before any reader opens it
+    _get_sqlite_writer()
+    con = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False)
+    for pragma in SQLITE_PRAGMAS:
+        con.execute(pragma)
+    return con
+
+
+@contextmanager
+def _sqlite_read():
+    """Yield a read-only SQLite connection from the reader pool."""
+    con = _checkout_sqlite_reader()
+    try:
+        yield con
+    finally:
+        _sqlite_readers.put(con)
+
+
+@contextmanager
+def _sqlite_write():
+    """Yield the SQLite writer connection inside a write transaction.
+
+    BEGIN IMMEDIATE takes the write lock up front, so a batch such as
+    save_schedule_version commits with a single fsync and never has to
+    upgrade a read lock mid-transaction (which can fail with SQLITE_BUSY
+    when another process holds the database).
+    """
+    con = _get_sqlite_writer()
+    with _sqlite_write_lock:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            yield con
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        con.execute("COMMIT")
+
+
+def _checkpoint_db_sqlite():
+    """Fold the WAL back into attendance.db so the file on disk is complete."""
+    con = _get_sqlite_writer()
+    with _sqlite_write_lock:
+        con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
 
-def _get_pg_connection():
-    """Get a Postgres connection."""
-    return psycopg2.connect(PG_DSN, sslmode="require")
+def _checkpoint_db_pg():
+    """Postgres keeps no local database file; nothing to checkpoint."""
 
 
-def init_db():
-    if USE_POSTGRES:
-        con = _get_pg_connection()
+# Mutations only mark the DB dirty; a background thread uploads it at most
+# once per SYNC_DELAY_SECONDS so bursts of edits coalesce into one upload.
+SYNC_DELAY_SECONDS = 2.0
+_sync_pending = threading.Event()
+
+
+# Held for a whole snapshot + upload, so the worker and the shutdown flush
+# never overlap and the flush can wait out an upload already in flight
+_sync_lock = threading.Lock()
+
+
+def _sync_db_now():
+    """Upload a consistent snapshot of attendance.db to R2.
+
+    The snapshot comes from SQLite's online backup API inside one read
+    transaction, so writes landing while the upload is in flight (including
+    auto-checkpoints into the main file) can't tear the uploaded copy.
+    """
+    with _sync_lock:
+        fd, snapshot_path = tempfile.mkstemp(
+            suffix=".r2-snapshot", dir=os.path.dirname(os.path.abspath(DB_PATH))
+        )
+        os.close(fd)
+        try:
+            snapshot = sqlite3.connect(snapshot_path)
+            try:
+                with _sqlite_read() as con:
+                    con.backup(snapshot)
+            finally:
+                snapshot.close()
+            upload_to_r2(Path(snapshot_path), DB_PATH)
+        finally:
+            os.remove(snapshot_path)
+
+
+def _sync_worker():
+    while True:
+        _sync_pending.wait()
+        time.sleep(SYNC_DELAY_SECONDS)
+        _sync_pending.clear()
+        try:
+            _sync_db_now()
+        except Exception as e:
+            print(f"[R2] Background DB sync failed: {e}")
+
+
+def _schedule_sync():
+    """Request an upload of attendance.db to R2 from the background worker."""
+    if is_r2_enabled() and not USE_POSTGRES:
+        _sync_pending.set()
+
+
+def flush_pending_sync():
+    """Upload attendance.db right away if a background sync is still pending.
+
+    Also waits for an upload the worker already started, since the worker is a
+    daemon thread and would otherwise be cut off at exit.
+    """
+    if _sync_pending.is_set():
+        _sync_pending.clear()
+        _sync_db_now()
+    else:
+        with _sync_lock:
+            pass
+
+
+if is_r2_enabled() and not USE_POSTGRES:
+    threading.Thread(target=_sync_worker, name="r2-db-sync", daemon=True).start()
+
+
+# Pooled Postgres connections that sat idle longer than this are probed with
+# SELECT 1 before reuse, since Heroku may have dropped them in the meantime.
+PG_POOL_MAXCONN = 20
+PG_IDLE_PING_SECONDS = 60.0
+_pg_pool_lock = threading.Lock()
+# ThreadedConnectionPool.getconn() raises PoolError instead of blocking once every
+# connection is out; callers queue here first so bursts wait for a free one.
+_pg_pool_slots = threading.BoundedSemaphore(PG_POOL_MAXCONN)
+
+# Hot write statements prepared server-side once per pooled connection
+PG_PREPARED_STATEMENTS = {
+    "upsert_just": """INSERT INTO justifications(agent_id, date, type, note, lead, created_at)
+        VALUES($1, $2, $3, $4, $5, $6)
+        ON CONFLICT (agent_id, date) DO UPDATE SET type=EXCLUDED.type, note=EXCLUDED.note,
+        lead=EXCLUDED.lead, created_at=EXCLUDED.created_at""",
+}
+
+if USE_POSTGRES:
+    class _PooledPgConnection(psycopg2.extensions.connection):
+        """Connection that carries its own pool bookkeeping.
+
+        Kept on the object rather than keyed by id(), so a connection the pool
+        closes can't pass its state on to a new one that reuses the id.
+        """
+        last_used = 0.0
+        prepared = False
+
+
+def _get_pg_pool():
+    """Get or create the Postgres connection pool."""
+    global _pg_pool
+    if _pg_pool is None:
+        with _pg_pool_lock:
+            if _pg_pool is None:
+                _pg_pool = psycopg2.pool.ThreadedConnectionPool(
+                    1, PG_POOL_MAXCONN, PG_DSN, sslmode="require", connection_factory=_PooledPgConnection
+                )
+    return _pg_pool
+
+
+def _checkout_pg_connection(pool):
+    """Get a live connection from the pool, replacing any that went stale while idle."""
+    con = pool.getconn()
+    idle = time.monotonic() - con.last_used
+    if con.closed or idle > PG_IDLE_PING_SECONDS:
+        try:
+            cur = con.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            con.rollback()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            _discard_pg_connection(pool, con)
+            con = pool.getconn()
+    return con
+
+
+def _prepare_statements_pg(con):
+    """PREPARE PG_PREPARED_STATEMENTS the first time a connection runs one.
+
+    Done on first use rather than at checkout, so init_db() can still borrow a
+    connection before the tables these statements reference exist.
+    """
+    if not con.prepared:
+        cur = con.cursor()
+        for name, sql in PG_PREPARED_STATEMENTS.items():
+            cur.execute(f"PREPARE {name} AS {sql}")
+        cur.close()
+        con.commit()
+        con.prepared = True
+
+
+def _prepare_statements_sqlite(con):
+    """sqlite3 caches compiled statements per connection; nothing to prepare."""
+
+
+def _discard_pg_connection(pool, con):
+    """Close a pooled connection; its bookkeeping goes away with it."""
+    pool.putconn(con, close=True)
+
+
+@contextmanager
+def _pg_conn():
+    """Borrow a Postgres connection from the pool and return it afterwards."""
+    pool = _get_pg_pool()
+    with _pg_pool_slots:
+        con = _checkout_pg_connection(pool)
+        try:
+            yield con
+        except BaseException:
+            if not con.closed:
+                con.rollback()
+            raise
+        finally:
+            if con.closed:
+                _discard_pg_connection(pool, con)
+            else:
+                con.last_used = time.monotonic()
+                pool.putconn(con)
+
+
+@contextmanager
+def _pg_write():
+    """Borrow a pooled Postgres connection and commit when the block succeeds."""
+    with _pg_conn() as con:
+        yield con
+        con.commit()
+
+
+def _migrate_sqlite_justification_dates(cur: sqlite3.Cursor):
+    """Convert justifications.date from ISO text to date.toordinal() integers.
+
+    SQLite cannot change a column's type in place, so the table is rebuilt.
+    julianday('0001-01-01') is 1721425.5 and date(1, 1, 1).toordinal() is 1.
+    """
+    cols = {r[1]: r[2] for r in cur.execute("PRAGMA table_info(justifications)")}
+    if cols.get("date", "").upper() != "TEXT":
+        return
+    cur.execute("DROP INDEX IF EXISTS ux_just_agent_date")
+    cur.execute("DROP INDEX IF EXISTS ix_just_date")
+    cur.execute("ALTER TABLE justifications RENAME TO justifications_old")
+    cur.execute(
+        """
+        CREATE TABLE justifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_id TEXT NOT NULL,
+            date INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            note TEXT,
+            lead TEXT,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    cur.execute(
+        """INSERT INTO justifications(id, agent_id, date, type, note, lead, created_at)
+           SELECT id, agent_id, CAST(julianday(date) - 1721424.5 AS INTEGER), type, note, lead, created_at
+           FROM justifications_old"""
+    )
+    cur.execute("DROP TABLE justifications_old")
+    # One justification per agent/day, as init_db enforces
+    cur.execute(
+        """DELETE FROM justifications WHERE id NOT IN
+           (SELECT MAX(id) FROM justifications GROUP BY agent_id, date)"""
+    )
+    # Restore the indexes dropped above; the upsert's ON CONFLICT needs the unique one
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_just_agent_date ON justifications(agent_id, date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_just_date ON justifications(date)")
+
+
+def _init_db_pg():
+    with _pg_conn() as con:
         cur = con.cursor()
         cur.execute(
             """
@@ -74,18 +409,42 @@ def init_db():
             )
             """
         )
+        # One justification per agent/day; drop older duplicates before enforcing it
+        cur.execute(
+            """DELETE FROM justifications a USING justifications b
+               WHERE a.agent_id = b.agent_id AND a.date = b.date AND a.id < b.id"""
+        )
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_just_agent_date ON justifications(agent_id, date)")
+        # Indexes for the date-range and version lookups
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_just_date ON justifications(date)")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_sched_entries_version ON schedule_entries(version_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_sched_versions_eff ON schedule_versions(effective_from)")
+        # Summary of every (agent, lead) pair seen in any schedule version, kept
+        # up to date by save_schedule_version for the index page dropdowns
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS agents_leads (
+                agent_id TEXT NOT NULL,
+                lead TEXT NOT NULL,
+                name TEXT,
+                PRIMARY KEY (agent_id, lead)
+            )
+            """
+        )
+        cur.execute(SQL_REFRESH_AGENTS_LEADS_ALL)
         con.commit()
         cur.close()
-        con.close()
-    else:
-        con = sqlite3.connect(DB_PATH)
+
+
+def _init_db_sqlite():
+    with _sqlite_write() as con:
         cur = con.cursor()
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS justifications (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 agent_id TEXT NOT NULL,
-                date TEXT NOT NULL,
+                date INTEGER NOT NULL,
                 type TEXT NOT NULL,
                 note TEXT,
                 lead TEXT,
@@ -122,12 +481,113 @@ def init_db():
             )
             """
         )
-        con.commit()
-        con.close()
+        # One justification per agent/day; drop older duplicates before enforcing it
+        cur.execute(
+            """DELETE FROM justifications WHERE id NOT IN
+               (SELECT MAX(id) FROM justifications GROUP BY agent_id, date)"""
+        )
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_just_agent_date ON justifications(agent_id, date)")
+        # Indexes for the date-range and version lookups
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_just_date ON justifications(date)")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_sched_entries_version ON schedule_entries(version_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_sched_versions_eff ON schedule_versions(effective_from)")
+        # Summary of every (agent, lead) pair seen in any schedule version, kept
+        # up to date by save_schedule_version for the index page dropdowns
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS agents_leads (
+                agent_id TEXT NOT NULL,
+                lead TEXT NOT NULL,
+                name TEXT,
+                PRIMARY KEY (agent_id, lead)
+            )
+            """
+        )
+        cur.execute(SQL_REFRESH_AGENTS_LEADS_ALL)
 
 
 # ============ Schedule Version Functions ============
 
+# schedule.csv columns, in schedule_entries insert order
+SCHEDULE_ENTRY_COLUMNS = [
+    "agent_id", "Shift", "name", "lead", "working_days", "days_off", "expected_start", "expected_end",
+]
+
+
+def _schedule_entry_rows(df: pd.DataFrame, version_id: int) -> Iterator[Tuple[Any, ...]]:
+    """Yield the schedule_entries parameter tuples for a schedule DataFrame.
+
+    Missing columns become "", and every value goes through str() as before.
+    Rows are generated lazily so large uploads never hold every tuple at once.
+    """
+    values = df.reindex(columns=SCHEDULE_ENTRY_COLUMNS, fill_value="").itertuples(index=False, name=None)
+    for r in values:
+        yield (version_id, *map(str, r))
+
+
+# Dialect-specific SQL, resolved once at import. The function bodies below are
+# shared by both backends and only ever see the strings for the active one.
+PH = "%s" if USE_POSTGRES else "?"
+
+
+def _params(n: int) -> str:
+    return ", ".join([PH] * n)
+
+
+SQL_INSERT_VERSION = (
+    f"INSERT INTO schedule_versions(effective_from, created_at, note) VALUES({_params(3)}) RETURNING id"
+)
+_INSERT_ENTRY = """INSERT INTO schedule_entries(version_id, agent_id, shift, name, lead,
+    working_days, days_off, expected_start, expected_end) VALUES"""
+SQL_INSERT_ENTRY = f"{_INSERT_ENTRY}({_params(9)})"
+SQL_SELECT_VERSION_FOR_DATE = f"""SELECT id FROM schedule_versions
+    WHERE effective_from <= {PH}
+    ORDER BY effective_from DESC, id DESC LIMIT 1"""
+SQL_SELECT_VERSIONS_UNTIL = f"""SELECT id, effective_from FROM schedule_versions
+    WHERE effective_from <= {PH}
+    ORDER BY effective_from, id"""
+SQL_SELECT_ENTRIES = f"""SELECT agent_id, shift AS "Shift", name, lead, working_days, days_off,
+    expected_start, expected_end
+    FROM schedule_entries WHERE version_id = {PH}"""
+if USE_POSTGRES:
+    # Runs the statement _prepare_statements sets up on each pooled connection
+    SQL_UPSERT_JUST = f"EXECUTE upsert_just({_params(6)})"
+else:
+    SQL_UPSERT_JUST = f"""INSERT INTO justifications(agent_id, date, type, note, lead, created_at)
+    VALUES({_params(6)})
+    ON CONFLICT(agent_id, date) DO UPDATE SET type=excluded.type, note=excluded.note,
+    lead=excluded.lead, created_at=excluded.created_at"""
+SQL_DELETE_JUST = f"DELETE FROM justifications WHERE agent_id={PH} AND date={PH}"
+SQL_JUST_RANGE = f"SELECT agent_id, date, type, note, lead FROM justifications WHERE date>={PH} AND date<={PH}"
+SQL_JUST_REPORT = "SELECT agent_id, date, type, note, lead, created_at FROM justifications ORDER BY created_at DESC"
+
+# Upsert the newest entry of each (agent, lead) pair into agents_leads
+_AGENTS_LEADS_UPSERT = """INSERT INTO agents_leads(agent_id, lead, name)
+    SELECT agent_id, COALESCE(lead, ''), name FROM schedule_entries
+    WHERE id IN (SELECT MAX(id) FROM schedule_entries {where} GROUP BY agent_id, lead)
+    ON CONFLICT (agent_id, lead) DO UPDATE SET name=excluded.name"""
+SQL_REFRESH_AGENTS_LEADS_ALL = _AGENTS_LEADS_UPSERT.format(where="")
+SQL_REFRESH_AGENTS_LEADS = _AGENTS_LEADS_UPSERT.format(where=f"WHERE version_id = {PH}")
+
+
+def _date_from_pg(d_val: Any) -> date:
+    """justifications.date comes back as a date, but tolerate datetimes and strings."""
+    if isinstance(d_val, datetime):
+        return d_val.date()
+    if isinstance(d_val, date):
+        return d_val
+    return date.fromisoformat(str(d_val))
+
+
+def _insert_schedule_entries_pg(cur, rows: Iterable[Tuple[Any, ...]]):
+    # Multi-row VALUES lists, one round-trip per page; consumes rows page by page
+    psycopg2.extras.execute_values(cur, f"{_INSERT_ENTRY} %s", rows, page_size=500)
+
+
+def _insert_schedule_entries_sqlite(cur, rows: Iterable[Tuple[Any, ...]]):
+    cur.executemany(SQL_INSERT_ENTRY, rows)
+
+
 def save_schedule_version(df: pd.DataFrame, effective_from: date, note: str = "") -> int:
     """
     Save a new schedule version to the database.
@@ -135,159 +595,129 @@ def save_schedule_version(df: pd.DataFrame, effective_from: date, note: str = ""
     """
     ts = datetime.now().isoformat(timespec="seconds")
     
-    if USE_POSTGRES:
-        con = _get_pg_connection()
+    with _db_write() as con:
         cur = con.cursor()
-        cur.execute(
-            "INSERT INTO schedule_versions(effective_from, created_at, note) VALUES(%s, %s, %s) RETURNING id",
-            (effective_from.isoformat(), ts, note)
-        )
+        cur.execute(SQL_INSERT_VERSION, (effective_from.isoformat(), ts, note))
         version_id = cur.fetchone()[0]
         
         # Insert all schedule entries
-        for _, row in df.iterrows():
-            cur.execute(
-                """INSERT INTO schedule_entries(version_id, agent_id, shift, name, lead, 
-                   working_days, days_off, expected_start, expected_end) 
-                   VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                (version_id, str(row.get("agent_id", "")), str(row.get("Shift", "")),
-                 str(row.get("name", "")), str(row.get("lead", "")),
-                 str(row.get("working_days", "")), str(row.get("days_off", "")),
-                 str(row.get("expected_start", "")), str(row.get("expected_end", "")))
-            )
-        con.commit()
+        _insert_schedule_entries(cur, _schedule_entry_rows(df, version_id))
+        cur.execute(SQL_REFRESH_AGENTS_LEADS, (version_id,))
         cur.close()
-        con.close()
-    else:
-        con = sqlite3.connect(DB_PATH)
-        cur = con.cursor()
-        cur.execute(
-            "INSERT INTO schedule_versions(effective_from, created_at, note) VALUES(?, ?, ?)",
-            (effective_from.isoformat(), ts, note)
-        )
-        version_id = cur.lastrowid
-        
-        # Insert all schedule entries
-        for _, row in df.iterrows():
-            cur.execute(
-                """INSERT INTO schedule_entries(version_id, agent_id, shift, name, lead,
-                   working_days, days_off, expected_start, expected_end)
-                   VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (version_id, str(row.get("agent_id", "")), str(row.get("Shift", "")),
-                 str(row.get("name", "")), str(row.get("lead", "")),
-                 str(row.get("working_days", "")), str(row.get("days_off", "")),
-                 str(row.get("expected_start", "")), str(row.get("expected_end", "")))
-            )
-        con.commit()
-        con.close()
-        sync_db_to_r2()
+    _schedule_sync()
     
+    _clear_schedule_caches()
     return version_id
 
 
+def _clear_schedule_caches():
+    """Drop cached schedule lookups after the version history changes."""
+    global _agents_leads_cache
+    _agents_leads_cache = None
+    _version_for_iso.cache_clear()
+    _sched_for_version.cache_clear()
+
+
 def get_schedule_version_for_date(target_date: date) -> Optional[int]:
     """
     Get the version_id of the schedule that was effective on target_date.
     Returns the version with the largest effective_from <= target_date.
     """
-    if USE_POSTGRES:
-        con = _get_pg_connection()
+    return _version_for_iso(target_date.isoformat())
+
+
+@lru_cache(maxsize=1024)
+def _version_for_iso(date_iso: str) -> Optional[int]:
+    """Cached version lookup keyed by ISO date; cleared by save_schedule_version."""
+    with _db_read() as con:
         cur = con.cursor()
-        cur.execute(
-            """SELECT id FROM schedule_versions 
-               WHERE effective_from <= %s 
-               ORDER BY effective_from DESC LIMIT 1""",
-            (target_date.isoformat(),)
-        )
+        cur.execute(SQL_SELECT_VERSION_FOR_DATE, (date_iso,))
         row = cur.fetchone()
         cur.close()
-        con.close()
-        return row[0] if row else None
-    else:
-        con = sqlite3.connect(DB_PATH)
-        cur = con.cursor()
-        cur.execute(
-            """SELECT id FROM schedule_versions 
-               WHERE effective_from <= ? 
-               ORDER BY effective_from DESC LIMIT 1""",
-            (target_date.isoformat(),)
-        )
-        row = cur.fetchone()
-        con.close()
-        return row[0] if row else None
+    return row[0] if row else None
 
 
-def get_schedule_entries_for_version(version_id: int) -> List[Dict[str, Any]]:
-    """Get all schedule entries for a specific version."""
-    if USE_POSTGRES:
-        con = _get_pg_connection()
+def _read_schedule_entries_pg(version_id: int) -> pd.DataFrame:
+    """Get all schedule entries for a specific version as a DataFrame."""
+    with _pg_conn() as con:
         cur = con.cursor()
-        cur.execute(
-            """SELECT agent_id, shift, name, lead, working_days, days_off, 
-                      expected_start, expected_end 
-               FROM schedule_entries WHERE version_id = %s""",
-            (version_id,)
-        )
+        cur.execute(SQL_SELECT_ENTRIES, (version_id,))
         rows = cur.fetchall()
         cur.close()
-        con.close()
-    else:
-        con = sqlite3.connect(DB_PATH)
-        cur = con.cursor()
-        cur.execute(
-            """SELECT agent_id, shift, name, lead, working_days, days_off,
-                      expected_start, expected_end
-               FROM schedule_entries WHERE version_id = ?""",
-            (version_id,)
-        )
-        rows = cur.fetchall()
-        con.close()
+    # pandas only supports sqlite3 among raw DBAPI connections, so build from records
+    return pd.DataFrame.from_records(rows, columns=SCHEDULE_ENTRY_COLUMNS)
+
+
+def _read_schedule_entries_sqlite(version_id: int) -> pd.DataFrame:
+    """Get all schedule entries for a specific version as a DataFrame."""
+    with _sqlite_read() as con:
+        return pd.read_sql_query(SQL_SELECT_ENTRIES, con, params=(version_id,))
+
+
+@lru_cache(maxsize=32)
+def _sched_for_version(version_id: int) -> Optional[pd.DataFrame]:
+    """Cached schedule entries of one version; None if the version has no entries."""
+    entries = _read_schedule_entries(version_id)
+    if entries.empty:
+        return None
     
-    return [
-        {
-            "agent_id": r[0], "Shift": r[1], "name": r[2], "lead": r[3],
-            "working_days": r[4], "days_off": r[5],
-            "expected_start": r[6], "expected_end": r[7]
-        }
-        for r in rows
-    ]
+    return entries
 
 
-def get_schedule_for_date(target_date: date) -> Optional[pd.DataFrame]:
+def get_schedule_segments(start: date, end: date) -> List[Tuple[date, date, Optional[pd.DataFrame]]]:
     """
-    Get the schedule DataFrame that was effective on target_date.
-    Returns None if no schedule version exists for that date.
+    Split [start, end] into runs of consecutive days that share one schedule version,
+    using a single query instead of one version lookup per day.
+    Returns (segment_start, segment_end, schedule) tuples in date order; schedule is
+    the cached entries of the version in effect on those days (None = no version
+    or an empty one, fall back to the CSV); frames are shared, copy before mutating.
     """
-    version_id = get_schedule_version_for_date(target_date)
-    if version_id is None:
-        return None
+    with _db_read() as con:
+        cur = con.cursor()
+        cur.execute(SQL_SELECT_VERSIONS_UNTIL, (end.isoformat(),))
+        rows = cur.fetchall()
+        cur.close()
     
-    entries = get_schedule_entries_for_version(version_id)
-    if not entries:
-        return None
+    # Version in effect on `start`, then every change of version inside the range
+    version_id = None
+    changes: List[Tuple[date, int]] = []
+    for vid, effective_from in rows:
+        eff = date.fromisoformat(str(effective_from)[:10])
+        if eff <= start:
+            version_id = vid
+        else:
+            changes.append((eff, vid))
     
-    return pd.DataFrame(entries)
+    runs: List[Tuple[date, date, Optional[int]]] = []
+    seg_start = start
+    for eff, vid in changes:
+        if eff > seg_start:
+            runs.append((seg_start, eff - timedelta(days=1), version_id))
+            seg_start = eff
+        version_id = vid
+    runs.append((seg_start, end, version_id))
+    
+    return [
+        (s, e, _sched_for_version(vid) if vid is not None else None)
+        for s, e, vid in runs
+    ]
 
 
-def get_all_schedule_versions() -> List[Dict[str, Any]]:
-    """Get all schedule versions with their effective dates."""
-    if USE_POSTGRES:
-        con = _get_pg_connection()
+def _fetch_all(sql: str) -> List[Tuple[Any, ...]]:
+    """Run a parameterless query and return all rows."""
+    with _db_read() as con:
         cur = con.cursor()
-        cur.execute(
-            "SELECT id, effective_from, created_at, note FROM schedule_versions ORDER BY effective_from DESC"
-        )
+        cur.execute(sql)
         rows = cur.fetchall()
         cur.close()
-        con.close()
-    else:
-        con = sqlite3.connect(DB_PATH)
-        cur = con.cursor()
-        cur.execute(
-            "SELECT id, effective_from, created_at, note FROM schedule_versions ORDER BY effective_from DESC"
-        )
-        rows = cur.fetchall()
-        con.close()
+    return rows
+
+
+def get_all_schedule_versions() -> List[Dict[str, Any]]:
+    """Get all schedule versions with their effective dates."""
+    rows = _fetch_all(
+        "SELECT id, effective_from, created_at, note FROM schedule_versions ORDER BY effective_from DESC"
+    )
     
     return [
         {"id": r[0], "effective_from": r[1], "created_at": r[2], "note": r[3]}
@@ -296,122 +726,111 @@ def get_all_schedule_versions() -> List[Dict[str, Any]]:
 
 
 def upsert_justification(agent_id: str, day: date, typ: str, note: str, lead: str):
-    from datetime import datetime
     ts = datetime.now().isoformat(timespec="seconds")
     
-    if USE_POSTGRES:
-        con = _get_pg_connection()
+    with _db_write() as con:
+        _prepare_statements(con)
         cur = con.cursor()
-        cur.execute("SELECT id FROM justifications WHERE agent_id=%s AND date=%s", (agent_id, day.isoformat()))
-        row = cur.fetchone()
-        if row:
-            cur.execute(
-                "UPDATE justifications SET type=%s, note=%s, lead=%s, created_at=%s WHERE id=%s",
-                (typ, note, lead, ts, row[0]),
-            )
-        else:
-            cur.execute(
-                "INSERT INTO justifications(agent_id, date, type, note, lead, created_at) VALUES(%s,%s,%s,%s,%s,%s)",
-                (agent_id, day.isoformat(), typ, note, lead, ts),
-            )
-        con.commit()
+        cur.execute(SQL_UPSERT_JUST, (agent_id, _date_to_db(day), typ, note, lead, ts))
         cur.close()
-        con.close()
-    else:
-        con = sqlite3.connect(DB_PATH)
-        cur = con.cursor()
-        cur.execute("SELECT id FROM justifications WHERE agent_id=? AND date=?", (agent_id, day.isoformat()))
-        row = cur.fetchone()
-        if row:
-            cur.execute(
-                "UPDATE justifications SET type=?, note=?, lead=?, created_at=? WHERE id=?",
-                (typ, note, lead, ts, row[0]),
-            )
-        else:
-            cur.execute(
-                "INSERT INTO justifications(agent_id, date, type, note, lead, created_at) VALUES(?,?,?,?,?,?)",
-                (agent_id, day.isoformat(), typ, note, lead, ts),
-            )
-        con.commit()
-        con.close()
-        # Sync DB to R2 after changes
-        sync_db_to_r2()
+    # Sync DB to R2 after changes
+    _schedule_sync()
 
 
 def delete_justification(agent_id: str, day: date):
-    if USE_POSTGRES:
-        con = _get_pg_connection()
+    with _db_write() as con:
         cur = con.cursor()
-        cur.execute("DELETE FROM justifications WHERE agent_id=%s AND date=%s", (agent_id, day.isoformat()))
-        con.commit()
+        cur.execute(SQL_DELETE_JUST, (agent_id, _date_to_db(day)))
         cur.close()
-        con.close()
-    else:
-        con = sqlite3.connect(DB_PATH)
-        cur = con.cursor()
-        cur.execute("DELETE FROM justifications WHERE agent_id=? AND date=?", (agent_id, day.isoformat()))
-        con.commit()
-        con.close()
-        # Sync DB to R2 after changes
-        sync_db_to_r2()
+    # Sync DB to R2 after changes
+    _schedule_sync()
 
 
 def get_justifications_map(start: date, end: date) -> Dict[Tuple[str, date], Dict[str, Any]]:
     out: Dict[Tuple[str, date], Dict[str, Any]] = {}
     
-    if USE_POSTGRES:
-        con = _get_pg_connection()
+    with _db_read() as con:
         cur = con.cursor()
-        cur.execute(
-            "SELECT agent_id, date, type, note, lead FROM justifications WHERE date>=%s AND date<=%s",
-            (start.isoformat(), end.isoformat()),
-        )
-        rows = cur.fetchall()
+        cur.execute(SQL_JUST_RANGE, (_date_to_db(start), _date_to_db(end)))
+        # Iterate the cursor directly instead of materializing fetchall()
+        _from_db = _date_from_db
+        for agent_id, d_val, typ, note, lead in cur:
+            out[(agent_id, _from_db(d_val))] = {"type": typ, "note": note, "lead": lead}
         cur.close()
-        con.close()
-        for agent_id, d_val, typ, note, lead in rows:
-            if hasattr(d_val, "isoformat"):
-                d = date.fromisoformat(d_val.isoformat())
-            else:
-                d = date.fromisoformat(str(d_val))
-            out[(agent_id, d)] = {"type": typ, "note": note, "lead": lead}
-    else:
-        con = sqlite3.connect(DB_PATH)
-        cur = con.cursor()
-        cur.execute(
-            "SELECT agent_id, date, type, note, lead FROM justifications WHERE date>=? AND date<=?",
-            (start.isoformat(), end.isoformat()),
-        )
-        rows = cur.fetchall()
-        con.close()
-        for agent_id, d_str, typ, note, lead in rows:
-            out[(agent_id, date.fromisoformat(d_str))] = {"type": typ, "note": note, "lead": lead}
     
     return out
 
 
+def get_justifications_report_df() -> pd.DataFrame:
+    """All justifications, newest first, as a DataFrame with the date as ISO text."""
+    df = pd.DataFrame.from_records(
+        _fetch_all(SQL_JUST_REPORT), columns=["agent_id", "date", "type", "note", "lead", "created_at"]
+    )
+    _from_db = _date_from_db
+    df["date"] = [_from_db(d_val).isoformat() for d_val in df["date"].tolist()]
+    return df
+
+
+# (base CSV frame, result) of the last get_all_agents_and_leads; reset by _clear_schedule_caches
+_agents_leads_cache: Optional[Tuple[pd.DataFrame, Tuple[List[str], List[Dict[str, str]]]]] = None
+
+
 def get_all_agents_and_leads() -> Tuple[List[str], List[Dict[str, str]]]:
-    """Get all unique leads and agents from all schedule versions and the base CSV."""
-    from .logic import load_schedule  # Import here to avoid circular import
+    """
+    Get all unique leads and agents from all schedule versions and the base CSV.
+    Memoized until a new schedule version is saved or schedule.csv changes; the
+    returned lists are shared, don't mutate them.
+    """
+    global _agents_leads_cache
+    from .logic import get_schedule_csv_df  # Import here to avoid circular import
     
-    leads = set()
-    agents = {}  # agent_id -> {"id": agent_id, "name": name}
+    base_sched = get_schedule_csv_df()
+    cached = _agents_leads_cache
+    if cached is not None and cached[0] is base_sched:
+        return cached[1]
     
-    # Add from base CSV schedule
-    base_sched = load_schedule()
-    for _, row in base_sched.iterrows():
-        leads.add(str(row["lead"]))
-        agents[str(row["agent_id"])] = {"id": str(row["agent_id"]), "name": str(row["name"])}
+    # Add from base CSV schedule (column-wise, no per-row Series)
+    leads = set(base_sched["lead"].astype(str).tolist())
+    agents = {  # agent_id -> {"id": agent_id, "name": name}
+        aid: {"id": aid, "name": name}
+        for aid, name in zip(base_sched["agent_id"].astype(str).tolist(), base_sched["name"].astype(str).tolist())
+    }
     
-    # Add from all schedule versions
-    versions = get_all_schedule_versions()
-    for version in versions:
-        entries = get_schedule_entries_for_version(version["id"])
-        for entry in entries:
-            leads.add(entry["lead"])
-            agents[entry["agent_id"]] = {"id": entry["agent_id"], "name": entry["name"]}
+    # Add from all schedule versions via the agents_leads summary table
+    rows = _fetch_all("SELECT lead, agent_id, name FROM agents_leads ORDER BY lead, name")
+    for entry_lead, entry_agent_id, entry_name in rows:
+        leads.add(entry_lead)
+        agents[entry_agent_id] = {"id": entry_agent_id, "name": entry_name}
     
-    return sorted(list(leads)), list(agents.values())
+    result = (sorted(list(leads)), list(agents.values()))
+    _agents_leads_cache = (base_sched, result)
+    return result
+
+
+# Bind the backend-specific pieces once at import, so callers don't pay for an
+# `if USE_POSTGRES` branch on every call. Only the parts that genuinely differ
+# between the two backends are split; everything else above is shared.
+if USE_POSTGRES:
+    init_db = _init_db_pg
+    checkpoint_db = _checkpoint_db_pg
+    _db_read = _pg_conn
+    _db_write = _pg_write
+    _read_schedule_entries = _read_schedule_entries_pg
+    _insert_schedule_entries = _insert_schedule_entries_pg
+    _prepare_statements = _prepare_statements_pg
+    _date_to_db = date.isoformat
+    _date_from_db = _date_from_pg
+else:
+    init_db = _init_db_sqlite
+    checkpoint_db = _checkpoint_db_sqlite
+    _db_read = _sqlite_read
+    _db_write = _sqlite_write
+    _read_schedule_entries = _read_schedule_entries_sqlite
+    _insert_schedule_entries = _insert_schedule_entries_sqlite
+    _prepare_statements = _prepare_statements_sqlite
+    # SQLite stores justifications.date as a day ordinal
+    _date_to_db = date.toordinal
+    _date_from_db = date.fromordinal
 
 
 # ============ Schedule Override Functions ============
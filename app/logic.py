@@ -1,9 +1,12 @@
+import os
+import threading
+import numpy as np
 import pandas as pd
-from datetime import datetime, date, time, timedelta
+from datetime import date, timedelta
 from typing import Optional, Dict, Any, Tuple, List
 
-from .utils import parse_hhmm_or_hhmmss, weekday_token, parse_days_list
-from .database import get_justifications_map, get_schedule_for_date, get_single_day_override_db, get_new_schedule_override
+from .utils import parse_time_seconds, parse_time_seconds_column, format_hhmm, days_mask, SECONDS_PER_DAY
+from .database import get_justifications_map, get_schedule_segments, get_single_day_override_db, get_new_schedule_override
 
 CSV_SCHEDULE = "schedule.csv"
 CSV_ACTUALS = "actuals.csv"
@@ -14,78 +17,90 @@ def load_schedule() -> pd.DataFrame:
     schedule.csv:
       agent_id, Shift, name, lead, working_days, days_off, expected_start, expected_end
     """
-    df = pd.read_csv(CSV_SCHEDULE)
+    df = pd.read_csv(CSV_SCHEDULE, dtype={"agent_id": str})
     return _process_schedule_df(df)
 
 
 def _process_schedule_df(df: pd.DataFrame) -> pd.DataFrame:
     """Process a schedule DataFrame, adding computed columns."""
-    df = df.copy()
+    # Shallow copy: every column below is reassigned, never modified in place, so the
+    # caller's frame (possibly a cached DB read) is left untouched without copying data
+    df = df.copy(deep=False)
     df["agent_id"] = df["agent_id"].astype(str).str.strip()
     df["Shift"] = df["Shift"].astype(str).str.strip()
     df["name"] = df["name"].astype(str).str.strip()
     df["lead"] = df["lead"].astype(str).str.strip()
     df["working_days"] = df["working_days"].astype(str).str.strip()
     df["days_off"] = df["days_off"].astype(str).str.strip()
-    df["expected_start_t"] = df["expected_start"].apply(parse_hhmm_or_hhmmss)
-    df["expected_end_t"] = df["expected_end"].apply(parse_hhmm_or_hhmmss)
-    df["is_night"] = df["Shift"].str.lower().eq("night")
+    df["days_off_mask"] = df["days_off"].map(days_mask)
+    # Horas como segundos desde medianoche (int32, -1 = vacío) en vez de objetos time
+    df["expected_start_s"] = parse_time_seconds_column(df["expected_start"])
+    df["expected_end_s"] = parse_time_seconds_column(df["expected_end"])
+    # Shift y lead tienen pocas categorías: se comparan por código en vez de por string
+    df["Shift"] = df["Shift"].astype("category")
+    df["lead"] = df["lead"].astype("category")
+    # Lower-cased lead, computed once per load, for case-insensitive lead filters
+    df["_lead_lower"] = df["lead"].str.lower().astype("category")
+    night = np.asarray(df["Shift"].cat.categories.str.lower() == "night")
+    df["is_night"] = night[df["Shift"].cat.codes.to_numpy()]
     return df
 
 
-def _select_agent_row_for_day(agent_rows: pd.DataFrame, day: date) -> Optional[pd.Series]:
-    """Select the correct row for an agent on a specific day, considering multiple schedules."""
-    if agent_rows.empty:
-        return None
-    
-    # If only one row, return it regardless of working days/days off
-    # The status will be determined later in compute_day_status
-    if len(agent_rows) == 1:
-        return agent_rows.iloc[0]
-    
-    # Multiple rows - find the most appropriate one
-    # For now, just return the first one that exists for this agent
-    # The schedule versioning logic should handle which one is active
-    return agent_rows.iloc[0]
+def lead_matches(sched: pd.DataFrame, lead: str) -> np.ndarray:
+    """Boolean mask of schedule rows whose lead equals lead, case-insensitively."""
+    return (sched["_lead_lower"] == lead.strip().lower()).to_numpy()
 
 
-def get_schedule_for_day(target_date: date) -> pd.DataFrame:
+def _first_row_positions(sched: pd.DataFrame) -> Dict[str, int]:
     """
-    Get the schedule that was effective on target_date.
-    First checks the database for versioned schedules, then falls back to CSV.
+    agent_id -> position of the agent's row in sched, so lookups skip a scan of the schedule.
+    If an agent has several rows, the first one applies.
     """
-    # Try to get versioned schedule from database
-    db_schedule = get_schedule_for_date(target_date)
-    if db_schedule is not None and not db_schedule.empty:
-        return _process_schedule_df(db_schedule)
-    
-    # Fall back to CSV file (for dates before any versioned schedule)
-    return SCHEDULE_DF
+    positions: Dict[str, int] = {}
+    for pos, aid in enumerate(sched["agent_id"].tolist()):
+        positions.setdefault(aid, pos)
+    return positions
+
+
+def get_schedule_segments_for_range(start: date, end: date) -> List[Tuple[date, date, pd.DataFrame]]:
+    """
+    Get the schedules effective over [start, end], once per run of days that share a
+    schedule version: the versioned schedule from the database, else the CSV.
+    Returns (segment_start, segment_end, schedule) tuples covering [start, end] in order.
+    """
+    segments = []
+    for seg_start, seg_end, db_schedule in get_schedule_segments(start, end):
+        if db_schedule is not None and not db_schedule.empty:
+            sched = _process_schedule_df(db_schedule)
+        else:
+            # Fall back to CSV file (for dates before any versioned schedule)
+            sched = SCHEDULE_DF
+        segments.append((seg_start, seg_end, sched))
+    return segments
 
 
 def get_effective_schedule_for_agent(agent_id: str, target_date: date, base_row: pd.Series) -> pd.Series:
     """
     Get the effective schedule for an agent on a specific day, applying any overrides.
-    Returns a modified copy of the base row with override values applied.
+    Returns a modified copy of the base row with override values applied, or
+    base_row itself when no override applies (callers must not mutate it).
     
     Priority (highest to lowest):
     1. Single-day override for this exact date
     2. New schedule override effective on or before this date
     3. Base schedule (from versioned DB or CSV)
     """
-    # Start with a copy of the base row
-    effective = base_row.copy()
-    
     # Check for single-day override first (highest priority)
     single_day = get_single_day_override_db(agent_id, target_date)
     if single_day:
-        # Apply single-day override
+        # Apply single-day override on a copy of the base row
+        effective = base_row.copy()
         if single_day.get("expected_start"):
             effective["expected_start"] = single_day["expected_start"]
-            effective["expected_start_t"] = parse_hhmm_or_hhmmss(single_day["expected_start"])
+            effective["expected_start_s"] = parse_time_seconds(single_day["expected_start"])
         if single_day.get("expected_end"):
             effective["expected_end"] = single_day["expected_end"]
-            effective["expected_end_t"] = parse_hhmm_or_hhmmss(single_day["expected_end"])
+            effective["expected_end_s"] = parse_time_seconds(single_day["expected_end"])
         if single_day.get("shift"):
             effective["Shift"] = single_day["shift"]
             effective["is_night"] = str(single_day["shift"]).lower() == "night"
@@ -94,76 +109,102 @@ def get_effective_schedule_for_agent(agent_id: str, target_date: date, base_row:
     # Check for new schedule override (applies from effective_date onwards)
     new_sched = get_new_schedule_override(agent_id, target_date)
     if new_sched:
-        # Apply new schedule override
+        # Apply new schedule override on a copy of the base row
+        effective = base_row.copy()
         if new_sched.get("working_days"):
             effective["working_days"] = new_sched["working_days"]
         if new_sched.get("days_off"):
             effective["days_off"] = new_sched["days_off"]
+            effective["days_off_mask"] = days_mask(new_sched["days_off"])
         if new_sched.get("expected_start"):
             effective["expected_start"] = new_sched["expected_start"]
-            effective["expected_start_t"] = parse_hhmm_or_hhmmss(new_sched["expected_start"])
+            effective["expected_start_s"] = parse_time_seconds(new_sched["expected_start"])
         if new_sched.get("expected_end"):
             effective["expected_end"] = new_sched["expected_end"]
-            effective["expected_end_t"] = parse_hhmm_or_hhmmss(new_sched["expected_end"])
+            effective["expected_end_s"] = parse_time_seconds(new_sched["expected_end"])
         if new_sched.get("shift"):
             effective["Shift"] = new_sched["shift"]
             effective["is_night"] = str(new_sched["shift"]).lower() == "night"
+        return effective
     
-    return effective
+    # No override: the base row as is, without a per-cell copy
+    return base_row
 
 def load_actuals() -> pd.DataFrame:
     """
     actuals.csv:
       date(mm/dd/yyyy), agent_id, name, shift, actual_start, actual_end
     """
-    df = pd.read_csv(CSV_ACTUALS)
+    # agent_id stays text (no int round-trip); dates parse in one vectorized pass
+    df = pd.read_csv(CSV_ACTUALS, dtype={"agent_id": str})
     df["agent_id"] = df["agent_id"].astype(str).str.strip()
-
-    def parse_date_us(s: str) -> date:
-        return datetime.strptime(str(s).strip(), "%m/%d/%Y").date()
-
-    df["date"] = df["date"].apply(parse_date_us)
-    df["actual_start_t"] = df["actual_start"].apply(parse_hhmm_or_hhmmss)
-    df["actual_end_t"] = df["actual_end"].apply(parse_hhmm_or_hhmmss)
+    df["date"] = pd.to_datetime(df["date"].astype(str).str.strip(), format="%m/%d/%Y").dt.date
+    df["actual_start_s"] = parse_time_seconds_column(df["actual_start"])
+    df["actual_end_s"] = parse_time_seconds_column(df["actual_end"])
+    # Membership in VALID_AGENT_IDS resolved once per parse via categorical codes (-1 = unknown)
+    valid_ids = pd.Categorical(df["agent_id"], categories=sorted(VALID_AGENT_IDS))
+    df["is_valid_agent"] = valid_ids.codes >= 0
     return df
 
 SCHEDULE_DF = load_schedule()
-VALID_AGENT_IDS = set(SCHEDULE_DF["agent_id"].tolist())
+VALID_AGENT_IDS = frozenset(SCHEDULE_DF["agent_id"].tolist())
+
+# path -> (st_mtime_ns, DataFrame) of the last parse of each CSV
+_CSV_CACHE: Dict[str, Tuple[int, pd.DataFrame]] = {}
+_csv_cache_lock = threading.Lock()
+
+def _load_csv_if_changed(path: str, loader) -> pd.DataFrame:
+    """Call loader() only when the file's mtime changed since the last call."""
+    mtime = os.stat(path).st_mtime_ns
+    with _csv_cache_lock:
+        cached = _CSV_CACHE.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, loader())
+            _CSV_CACHE[path] = cached
+        return cached[1]
 
 def get_actuals_df() -> pd.DataFrame:
-    """Relee actuals.csv en cada petición para reflejar cambios sin reiniciar."""
-    return load_actuals()
+    """
+    Relee actuals.csv solo cuando cambia su mtime, para reflejar cambios sin reiniciar.
+    El DataFrame se comparte entre peticiones; no modificarlo in place.
+    """
+    return _load_csv_if_changed(CSV_ACTUALS, load_actuals)
 
-def expected_interval_for_day(agent_row: pd.Series, day: date) -> Optional[Tuple[datetime, datetime, bool]]:
+def get_schedule_csv_df() -> pd.DataFrame:
     """
-    Intervalo esperado (start, end). Si end <= start, suma 1 día (cruce de medianoche).
-    Devuelve (start_dt, end_dt, is_night).
+    Como load_schedule, pero relee schedule.csv solo cuando cambia su mtime
+    (p. ej. tras /admin/upload-schedule). Compartido; no modificarlo in place.
     """
-    start_t = agent_row["expected_start_t"]
-    end_t = agent_row["expected_end_t"]
-    if not start_t or not end_t:
+    return _load_csv_if_changed(CSV_SCHEDULE, load_schedule)
+
+def expected_interval_for_day(agent_row: pd.Series, day: date) -> Optional[Tuple[int, int, bool]]:
+    """
+    Intervalo esperado (start, end) en segundos desde la medianoche de `day`.
+    Si end <= start, suma 1 día (cruce de medianoche).
+    Devuelve (start_s, end_s, is_night).
+    """
+    start_s = int(agent_row["expected_start_s"])
+    end_s = int(agent_row["expected_end_s"])
+    if start_s < 0 or end_s < 0:
         return None
-    start_dt = datetime.combine(day, start_t)
-    end_dt = datetime.combine(day, end_t)
-    if end_dt <= start_dt:
-        end_dt = end_dt + timedelta(days=1)
-    return start_dt, end_dt, bool(agent_row["is_night"])
+    if end_s <= start_s:
+        end_s += SECONDS_PER_DAY
+    return start_s, end_s, bool(agent_row["is_night"])
 
-def actual_interval_for_day(actual_row: Optional[pd.Series], day: date, is_night: bool) -> Optional[Tuple[datetime, datetime]]:
+def actual_interval_for_day(actual_row: Optional[pd.Series], day: date, is_night: bool) -> Optional[Tuple[int, int]]:
     """
-    Intervalo real (start, end) del registro. Si end <= start, suma 1 día (cruce de medianoche).
+    Intervalo real (start, end) del registro, en segundos desde la medianoche de `day`.
+    Si end <= start, suma 1 día (cruce de medianoche).
     """
     if actual_row is None:
         return None
-    astart_t = actual_row["actual_start_t"]
-    aend_t = actual_row["actual_end_t"]
-    if not astart_t or not aend_t:
+    astart_s = int(actual_row["actual_start_s"])
+    aend_s = int(actual_row["actual_end_s"])
+    if astart_s < 0 or aend_s < 0:
         return None
-    astart_dt = datetime.combine(day, astart_t)
-    aend_dt = datetime.combine(day, aend_t)
-    if aend_dt <= astart_dt:
-        aend_dt = aend_dt + timedelta(days=1)
-    return astart_dt, aend_dt
+    if aend_s <= astart_s:
+        aend_s += SECONDS_PER_DAY
+    return astart_s, aend_s
 
 def compute_day_status(
     agent_row: pd.Series,
@@ -194,8 +235,7 @@ def compute_day_status(
     name = effective_row["name"]
     lead = effective_row["lead"]
     shift = effective_row["Shift"]
-    days_off = set(parse_days_list(effective_row["days_off"]))
-    dow = weekday_token(day)
+    is_day_off = (effective_row["days_off_mask"] >> day.weekday()) & 1
     
     today = date.today()
     
@@ -212,7 +252,7 @@ def compute_day_status(
         original_status = "-"
     # Base (estado original)
     elif day <= today:
-        if dow in days_off:
+        if is_day_off:
             original_status = "O"
         else:
             exp_iv = expected_interval_for_day(effective_row, day)
@@ -220,22 +260,22 @@ def compute_day_status(
                 original_status = "O"
             else:
                 exp_start, exp_end, is_night = exp_iv
-                planned_start = exp_start.strftime("%H:%M")
-                planned_end = exp_end.strftime("%H:%M")
+                planned_start = format_hhmm(exp_start)
+                planned_end = format_hhmm(exp_end)
                 act_iv = actual_interval_for_day(actual_row, day, is_night)
                 if act_iv is not None:
                     act_start, act_end = act_iv
-                    actual_start = act_start.strftime("%H:%M")
-                    actual_end = act_end.strftime("%H:%M")
+                    actual_start = format_hhmm(act_start)
+                    actual_end = format_hhmm(act_end)
                 if act_iv is None:
                     original_status = "U"
                 else:
                     act_start, act_end = act_iv
-                    atraso_entrada = max(0, int((act_start - exp_start).total_seconds() // 60))
-                    salida_anticipada = max(0, int((exp_end - act_end).total_seconds() // 60))
-                    late_raw = atraso_entrada + salida_anticipada
-                    overtime_minutes = max(0, int((exp_start - act_start).total_seconds() // 60)) + \
-                                       max(0, int((act_end - exp_end).total_seconds() // 60))
+                    start_diff = act_start - exp_start
+                    end_diff = act_end - exp_end
+                    # Igual que _day_status_grid: una sola resta por extremo
+                    late_raw = max(0, start_diff // 60) + max(0, -end_diff // 60)
+                    overtime_minutes = max(0, -start_diff // 60) + max(0, end_diff // 60)
                     # ✔ tolerancia de 2 minutos
                     if late_raw <= TOLERANCE_MINUTES:
                         late_minutes = 0
@@ -299,6 +339,59 @@ def compute_day_status(
         "is_overridden": is_overridden,
     }
 
+# Status codes for the vectorized kernel; 0 doubles as "no override" in override grids
+STATUS_LABELS = ("", "-", "O", "U", "A", "D", "J", "V", "H", "C", "ML")
+CODE_PENDING, CODE_O, CODE_U, CODE_A, CODE_D, CODE_J, CODE_V, CODE_H, CODE_C, CODE_ML = range(1, 11)
+OVERRIDE_CODES = {t: STATUS_LABELS.index(t) for t in ("A", "J", "V", "U", "D", "H", "C", "ML")}
+
+
+def _day_status_grid(
+    exp_start: np.ndarray,
+    exp_end: np.ndarray,
+    act_start: np.ndarray,
+    act_end: np.ndarray,
+    is_off: np.ndarray,
+    is_future: np.ndarray,
+    override: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Same rules as compute_day_status, applied to a whole (agent, day) grid at once.
+    Times are seconds since midnight with -1 for missing; override holds OVERRIDE_CODES (0 = none).
+    Devuelve (status, original_status, late_minutes, overtime_minutes).
+    """
+    no_expected = (exp_start < 0) | (exp_end < 0)
+    no_actual = (act_start < 0) | (act_end < 0)
+
+    # Cruce de medianoche: si end <= start, el fin es al día siguiente
+    exp_end = exp_end + (exp_end <= exp_start) * SECONDS_PER_DAY
+    act_end = act_end + (act_end <= act_start) * SECONDS_PER_DAY
+
+    # Each difference is computed once and reused for both late and overtime
+    start_diff = act_start - exp_start
+    end_diff = act_end - exp_end
+    late_raw = np.maximum(0, start_diff // 60) + np.maximum(0, -end_diff // 60)
+    overtime = np.maximum(0, -start_diff // 60) + np.maximum(0, end_diff // 60)
+    on_time = late_raw <= TOLERANCE_MINUTES
+    original = np.select(
+        [is_future, is_off | no_expected, no_actual, on_time],
+        [CODE_PENDING, CODE_O, CODE_U, CODE_A],
+        CODE_D,
+    ).astype(np.int8)
+    worked = (original == CODE_A) | (original == CODE_D)
+    late = np.where(original == CODE_D, late_raw, 0)
+    overtime = np.where(worked, overtime, 0)
+
+    # Override (justificación); nunca sobre días de descanso
+    overridden = (override > 0) & (original != CODE_O)
+    status = np.where(overridden, override, original).astype(np.int8)
+    no_penalty = overridden & (
+        ((original == CODE_D) & (status != CODE_D)) | (status == CODE_A) | (status == CODE_J)
+    )
+    late = np.where(no_penalty, 0, late)
+    overtime = np.where(no_penalty, 0, overtime)
+    return status, original, late, overtime
+
+
 def build_attendance(start: date, end: date, lead: Optional[str], agent_id: Optional[str], status_filter: Optional[str] = None) -> Dict[str, Any]:
     """
     Agrega por agente:
@@ -310,136 +403,176 @@ def build_attendance(start: date, end: date, lead: Optional[str], agent_id: Opti
     """
     just_map = get_justifications_map(start, end)
 
-    # Index de actuals por (agent_id, date)
+    # Actuals por (agent_id, date)
     # If there are multiple connection rows per day, aggregate them taking
     # the earliest start and the latest end so we don't miss delays.
-    actuals_idx: Dict[Tuple[str, date], pd.Series] = {}
     df_act_all = get_actuals_df()
-    df_act = df_act_all[df_act_all["agent_id"].isin(VALID_AGENT_IDS)].copy()
-    if not df_act.empty:
-        grp = df_act.groupby(["agent_id", "date"])
-        for (aid, d), g in grp:
-            # pick earliest non-null start and latest non-null end
-            starts = [v for v in g["actual_start_t"].tolist() if pd.notnull(v)]
-            ends = [v for v in g["actual_end_t"].tolist() if pd.notnull(v)]
-            astart = min(starts) if starts else None
-            aend = max(ends) if ends else None
-            # create a Series similar to original rows
-            actuals_idx[(str(aid), d)] = pd.Series({
-                "agent_id": str(aid),
-                "date": d,
-                "actual_start_t": astart,
-                "actual_end_t": aend,
-            })
+    df_act = df_act_all[df_act_all["is_valid_agent"]]
+    # earliest non-null start and latest non-null end, as seconds of day (NaN = none)
+    starts = df_act["actual_start_s"]
+    ends = df_act["actual_end_s"]
+    actuals_agg = (
+        pd.DataFrame({
+            "agent_id": df_act["agent_id"],
+            "date": df_act["date"],
+            "astart": starts.where(starts >= 0),
+            "aend": ends.where(ends >= 0),
+        })
+        .groupby(["agent_id", "date"], sort=False)
+        .agg(astart=("astart", "min"), aend=("aend", "max"))
+    )
+
+    # One schedule per run of days sharing a version, instead of a lookup per day
+    segments = get_schedule_segments_for_range(start, end)
 
-    # Cache for schedule by date to avoid repeated lookups
-    schedule_cache: Dict[date, pd.DataFrame] = {}
-    
-    def get_schedule_cached(d: date) -> pd.DataFrame:
-        if d not in schedule_cache:
-            schedule_cache[d] = get_schedule_for_day(d)
-        return schedule_cache[d]
+    if agent_id:
+        # Single agent: only its own rows matter, skip collecting everyone else
+        target_aid = str(agent_id).strip()
+        sources = [sched[sched["agent_id"] == target_aid] for _, _, sched in segments]
+    else:
+        sources = [sched for _, _, sched in segments]
 
     # Collect all unique agents from all schedules in the date range
     all_agents: Dict[str, Dict[str, Any]] = {}  # agent_id -> latest agent info
-    cur = start
-    while cur <= end:
-        sched = get_schedule_cached(cur)
-        for _, row in sched.iterrows():
-            aid = str(row["agent_id"])
+    for sched in sources:
+        for aid, name, lead_val in zip(sched["agent_id"].astype(str).tolist(), sched["name"].tolist(), sched["lead"].tolist()):
             # Always update with latest info (from latest schedule)
-            all_agents[aid] = {"name": row["name"], "lead": row["lead"]}
-        cur += timedelta(days=1)
+            all_agents[aid] = {"name": name, "lead": lead_val}
 
     # Filter agents by lead/agent_id
     if lead:
-        lead_lower = lead.strip().lower()
         # Check if agent had this lead on ANY day in the date range
         valid_agents = set()
-        cur = start
-        while cur <= end:
-            sched = get_schedule_cached(cur)
-            day_agents = set(sched[sched["lead"].str.lower() == lead_lower]["agent_id"].tolist())
-            valid_agents.update(day_agents)
-            cur += timedelta(days=1)
+        for _, _, sched in segments:
+            valid_agents.update(sched["agent_id"][lead_matches(sched, lead)].tolist())
         all_agents = {k: v for k, v in all_agents.items() if k in valid_agents}
-    
-    if agent_id:
-        target_aid = str(agent_id).strip()
-        all_agents = {k: v for k, v in all_agents.items() if k == target_aid}
+
+    # normalize status_filter: accept comma-separated, case-insensitive
+    allowed_statuses = None
+    if status_filter is not None:
+        allowed_statuses = {s.strip().upper() for s in str(status_filter).split(",") if s.strip()}
+
+    # Fill the (agent, day) grid; the status math itself runs vectorized in _day_status_grid
+    agent_ids = list(all_agents.keys())
+    days_list: List[date] = []
+    cur = start
+    while cur <= end:
+        days_list.append(cur)
+        cur += timedelta(days=1)
+    shape = (len(agent_ids), len(days_list))
+    present = np.zeros(shape, dtype=bool)
+    is_off = np.zeros(shape, dtype=bool)
+    exp_start = np.full(shape, -1, dtype=np.int32)
+    exp_end = np.full(shape, -1, dtype=np.int32)
+    override = np.zeros(shape, dtype=np.int8)
+    cell_info: Dict[Tuple[int, int], Tuple[Any, Any, Any]] = {}
+    future = np.array([d > date.today() for d in days_list], dtype=bool)
+
+    dows = [d.weekday() for d in days_list]
+    iso_dates = [d.isoformat() for d in days_list]
+
+    agent_pos = {aid: i for i, aid in enumerate(agent_ids)}
+
+    # Walk only the agents each schedule version actually has; an agent is never
+    # visited for a segment (or its days) it isn't scheduled in
+    for seg_start, seg_end, sched in segments:
+        seg_days = range((seg_start - start).days, (seg_end - start).days + 1)
+        for aid, pos in _first_row_positions(sched).items():
+            i = agent_pos.get(aid)
+            if i is None:
+                # Filtered out by lead/agent_id
+                continue
+            arow = sched.iloc[pos]
+            for j in seg_days:
+                day = days_list[j]
+                effective_row = get_effective_schedule_for_agent(aid, day, arow)
+                present[i, j] = True
+                cell_info[(i, j)] = (effective_row["name"], effective_row["lead"], effective_row["Shift"])
+                is_off[i, j] = (effective_row["days_off_mask"] >> dows[j]) & 1
+                exp_start[i, j] = effective_row["expected_start_s"]
+                exp_end[i, j] = effective_row["expected_end_s"]
+
+    # Align actuals with the (agent, day) grid in one hash join; -1 where there is no record
+    aligned = actuals_agg.reindex(pd.MultiIndex.from_product([agent_ids, days_list]))
+    act_start = aligned["astart"].fillna(-1).to_numpy(dtype=np.int32).reshape(shape)
+    act_end = aligned["aend"].fillna(-1).to_numpy(dtype=np.int32).reshape(shape)
+
+    # Justificaciones -> matriz densa de códigos, en una sola pasada sobre el mapa
+    day_pos = {d: j for j, d in enumerate(days_list)}
+    for (aid, d), just in just_map.items():
+        i = agent_pos.get(aid)
+        j = day_pos.get(d)
+        if i is not None and j is not None:
+            override[i, j] = OVERRIDE_CODES.get(just.get("type"), 0)
+
+    status, original, late, overtime = _day_status_grid(
+        exp_start, exp_end, act_start, act_end, is_off, future[np.newaxis, :], override
+    )
+    # Planned/actual times are only reported when the day got that far in compute_day_status
+    planned = (original == CODE_U) | (original == CODE_A) | (original == CODE_D)
+    has_actual = (original == CODE_A) | (original == CODE_D)
+    exp_end_adj = exp_end + (exp_end <= exp_start) * SECONDS_PER_DAY
+    act_end_adj = act_end + (act_end <= act_start) * SECONDS_PER_DAY
+
+    # Match only the current visible status (after overrides)
+    matched = present.copy()
+    if allowed_statuses is not None:
+        allowed_codes = [c for c, label in enumerate(STATUS_LABELS) if label and label.upper() in allowed_statuses]
+        matched &= np.isin(status, allowed_codes)
+
+    # Contadores por estado mostrado (post-override), una fila de bincount por agente
+    n_codes = len(STATUS_LABELS)
+    row_ids = np.nonzero(matched)[0]
+    counts = np.bincount(row_ids * n_codes + status[matched], minlength=shape[0] * n_codes).reshape(shape[0], n_codes)
+    # Suma de minutos tarde (post-override y post-tolerancia)
+    late_sums = np.where(matched, late, 0).sum(axis=1)
+    # Justified delays: originalmente D y ahora A o J
+    justified_delays = (matched & (original == CODE_D) & ((status == CODE_A) | (status == CODE_J))).sum(axis=1)
 
     agents_out = []
-    for aid, agent_info in all_agents.items():
+    for i, aid in enumerate(agent_ids):
+        if not counts[i].any():  # Only include agents with matching days
+            continue
+        agent_info = all_agents[aid]
         days = []
-        late_sum = delays = vacations = justified = unjustified = justified_delays_sum = holidays = comp_days = medical_leaves = 0
-        cur = start
-        
-        # normalize status_filter: accept comma-separated, case-insensitive
-        allowed_statuses = None
-        if status_filter is not None:
-            allowed_statuses = {s.strip().upper() for s in str(status_filter).split(",") if s.strip()}
-
-        while cur <= end:
-            # Get schedule for this specific day
-            day_sched = get_schedule_cached(cur)
-            agent_rows = day_sched[day_sched["agent_id"] == aid]
-            
-            arow = _select_agent_row_for_day(agent_rows, cur)
-            if arow is None:
-                # Agent not in schedule for this day - skip
-                cur += timedelta(days=1)
-                continue
-            arow_actual = actuals_idx.get((aid, cur))
-            item = compute_day_status(arow, cur, arow_actual, just_map)
-            
-            # Match only the current visible status (after overrides)
-            match = True
-            if allowed_statuses is not None:
-                match = item["status"].upper() in allowed_statuses
-
-            if match:
-                days.append(item)
-
-                # Suma de minutos tarde (post-override y post-tolerancia)
-                late_sum += item["late_minutes"]
-
-                # Contadores por estado mostrado (post-override)
-                if item["status"] == "D":
-                    delays += 1
-                elif item["status"] == "V":
-                    vacations += 1
-                elif item["status"] == "J":
-                    justified += 1
-                elif item["status"] == "U":
-                    unjustified += 1
-                elif item["status"] == "H":
-                    holidays += 1
-                elif item["status"] == "C":
-                    comp_days += 1
-                elif item["status"] == "ML":
-                    medical_leaves += 1
-
-                # Justified delays: originalmente D y ahora A o J
-                if item["original_status"] == "D" and item["status"] in {"A", "J"}:
-                    justified_delays_sum += 1
-
-            cur += timedelta(days=1)
-
-        if days:  # Only include agents with matching days
-            agents_out.append({
+        for j in np.nonzero(matched[i])[0]:
+            name, lead_val, shift = cell_info[(i, j)]
+            st = STATUS_LABELS[status[i, j]]
+            orig = STATUS_LABELS[original[i, j]]
+            late_minutes = int(late[i, j])
+            days.append({
                 "agent_id": aid,
-                "name": agent_info["name"],
-                "lead": agent_info["lead"],
-                "days": days,
-                "late_minutes_sum": late_sum,
-                "delays_sum": delays,
-                "vacations_sum": vacations,
-                "justified_sum": justified,
-                "unjustified_sum": unjustified,
-                "justified_delays_sum": justified_delays_sum,
-                "holidays_sum": holidays,
-                "comp_days_sum": comp_days,
-                "medical_leaves_sum": medical_leaves,
+                "name": name,
+                "lead": lead_val,
+                "shift": shift,
+                "date": iso_dates[j],
+                "status": st,
+                "actual_start": format_hhmm(act_start[i, j]) if has_actual[i, j] else "",
+                "actual_end": format_hhmm(act_end_adj[i, j]) if has_actual[i, j] else "",
+                "planned_start": format_hhmm(exp_start[i, j]) if planned[i, j] else "",
+                "planned_end": format_hhmm(exp_end_adj[i, j]) if planned[i, j] else "",
+                "late_minutes": late_minutes,
+                "overtime_minutes": int(overtime[i, j]),
+                "tooltip": f"Delay: {late_minutes} minutes" if st == "D" else None,
+                "original_status": orig,
+                "is_overridden": bool(override[i, j]) and orig != "O",
             })
 
-    return {"agents": agents_out}
\ No newline at end of file
+        c = counts[i]
+        agents_out.append({
+            "agent_id": aid,
+            "name": agent_info["name"],
+            "lead": agent_info["lead"],
+            "days": days,
+            "late_minutes_sum": int(late_sums[i]),
+            "delays_sum": int(c[CODE_D]),
+            "vacations_sum": int(c[CODE_V]),
+            "justified_sum": int(c[CODE_J]),
+            "unjustified_sum": int(c[CODE_U]),
+            "justified_delays_sum": int(justified_delays[i]),
+            "holidays_sum": int(c[CODE_H]),
+            "comp_days_sum": int(c[CODE_C]),
+            "medical_leaves_sum": int(c[CODE_ML]),
+        })
+
+    return {"agents": agents_out}
@@ -1,21 +1,24 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from datetime import date, timedelta
-import json
+import asyncio
+import orjson
+import os
+import threading
+from functools import lru_cache
 from pathlib import Path
-import csv
 
 from .storage import sync_from_r2
-from .database import get_all_agents_and_leads, init_db
+from .database import get_all_agents_and_leads, init_db, flush_pending_sync
 from .routes.attendance import router as attendance_router
 from .routes.admin import router as admin_router
 
 APP_TITLE = "Attendance"
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-app = FastAPI(title=APP_TITLE)
+app = FastAPI(title=APP_TITLE, default_response_class=ORJSONResponse)
 
 # PWA: servir archivos estáticos
 app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
@@ -29,35 +32,75 @@ def eliminar_delay_min_generalizado(df: pd.DataFrame) -> pd.DataFrame:
     Si para un mismo (fecha, empleado_id) hay al menos un status == 'D' y al menos un status != 'D',
     entonces delay_min se pone a 0 para todas las filas de ese grupo.
     """
-    def regla_delay(grupo):
-        tiene_d = (grupo['status'] == 'D').any()
-        tiene_no_d = (grupo['status'] != 'D').any()
-        if tiene_d and tiene_no_d:
-            grupo['delay_min'] = 0
-        return grupo
-    return df.groupby(['fecha', 'empleado_id'], group_keys=False).apply(regla_delay)
-
-# Cache for actuals data
-actuals_cache = []
-
-# Load actuals.csv into memory on app startup
-@app.on_event("startup")
-def load_actuals():
-    global actuals_cache
+    es_d = df['status'].eq('D')
+    claves = [df['fecha'], df['empleado_id']]
+    tiene_d = es_d.groupby(claves, dropna=False).transform('any')
+    tiene_no_d = (~es_d).groupby(claves, dropna=False).transform('any')
+    df = df.copy()
+    df.loc[tiene_d & tiene_no_d, 'delay_min'] = 0
+    return df
+
+# Actuals indexed by (agent_id, date) for /attendance-details
+ACTUALS_DETAIL_COLUMNS = ["shift", "actual_start", "actual_end"]
+actuals_index = {}
+actuals_index_mtime = None
+# The startup warm-up thread and request handlers may both find the index stale
+_actuals_index_lock = threading.Lock()
+
+def refresh_actuals_index():
+    """Rebuild actuals_index when actuals.csv changed (e.g. after /admin/upload-actuals)."""
+    with _actuals_index_lock:
+        _refresh_actuals_index_locked()
+
+def _refresh_actuals_index_locked():
+    global actuals_index, actuals_index_mtime
     try:
-        with open("actuals.csv", "r") as file:
-            reader = csv.DictReader(file)
-            actuals_cache = [row for row in reader]
+        mtime = os.stat("actuals.csv").st_mtime_ns
+        if mtime == actuals_index_mtime:
+            return
+        # Raw strings as in the CSV ("" for empty cells); missing columns read as "—".
+        # Only the key and detail columns are parsed; a callable usecols tolerates absent ones
+        wanted = {"agent_id", "date", *ACTUALS_DETAIL_COLUMNS}
+        df = pd.read_csv("actuals.csv", dtype=str, keep_default_na=False, usecols=lambda c: c in wanted)
+        df = df.drop_duplicates(["agent_id", "date"], keep="first")
+        details = df.reindex(columns=ACTUALS_DETAIL_COLUMNS, fill_value="—")
+        actuals_index = {
+            key: dict(zip(ACTUALS_DETAIL_COLUMNS, values))
+            for key, values in zip(
+                zip(df["agent_id"].tolist(), df["date"].tolist()),
+                details.itertuples(index=False, name=None),
+            )
+        }
+        actuals_index_mtime = mtime
+        _details_cached.cache_clear()
         print("Loaded actuals.csv into memory.")
     except Exception as e:
         print(f"Error loading actuals.csv: {e}")
 
-    # Sync files from R2 on startup (before init_db)
-    sync_from_r2()
+_startup_tasks = set()
+
+# Load actuals.csv into memory on app startup
+@app.on_event("startup")
+async def load_actuals():
+    # Sync files from R2 on startup (before init_db), off the event loop thread.
+    # Still awaited: attendance.db ships with the repo, so serving before the
+    # download finishes would read (and write) a stale database.
+    await asyncio.to_thread(sync_from_r2)
 
     # Init DB
     init_db()
 
+    # Build the /attendance-details index in the background, after the download so
+    # the current actuals.csv is parsed once; requests refresh it themselves if needed
+    task = asyncio.create_task(asyncio.to_thread(refresh_actuals_index))
+    _startup_tasks.add(task)
+    task.add_done_callback(_startup_tasks.discard)
+
+# Push any DB edits still waiting on the background R2 sync before exiting
+@app.on_event("shutdown")
+def flush_db_sync():
+    flush_pending_sync()
+
 # Include routes
 app.include_router(attendance_router)
 app.include_router(admin_router)
@@ -66,6 +109,19 @@ app.include_router(admin_router)
 def test_endpoint():
     return {"message": "Server is working"}
 
+# (get_all_agents_and_leads result, its JSON) so unchanged options skip re-encoding
+_options_json_cache = None
+
+def get_options_json():
+    global _options_json_cache
+    options = get_all_agents_and_leads()
+    cached = _options_json_cache
+    if cached is None or cached[0] is not options:
+        leads, agents = options
+        cached = (options, orjson.dumps({"leads": leads, "agents": agents}).decode())
+        _options_json_cache = cached
+    return cached[1]
+
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request):
     # Rango por defecto: mes actual del año actual
@@ -80,8 +136,7 @@ def index(request: Request):
         end = date(yr, mo + 1, 1) - timedelta(days=1)
 
     # Opciones dinámicas (leads y agentes) desde todos los schedules versionados y CSV
-    leads, agents = get_all_agents_and_leads()
-    options_json = json.dumps({"leads": leads, "agents": agents})
+    options_json = get_options_json()
 
     return templates.TemplateResponse("index.html", {
         "request": request,
@@ -121,13 +176,9 @@ def index(request: Request):
 
 # Helper to find attendance details by agent_id and date
 def get_attendance_details(agent_id, date):
-    for row in actuals_cache:
-        if row['agent_id'] == str(agent_id) and row['date'] == date:
-            return {
-                "shift": row.get("shift", "—"),
-                "actual_start": row.get("actual_start", "—"),
-                "actual_end": row.get("actual_end", "—")
-            }
+    row = actuals_index.get((str(agent_id), date))
+    if row is not None:
+        return dict(row)
     return {"shift": "—", "actual_start": "—", "actual_end": "—"}
 
 SHIFT_STARTS = {
@@ -136,29 +187,40 @@ SHIFT_STARTS = {
     "Night": "22:00"
 }
 
-def calculate_delay(actual_start, planned_start=None, shift=None):
-    from datetime import datetime
+def hm_to_min(s):
+    """'HH:MM' (o 'HH:MM:SS', ignorando segundos) -> minutos desde medianoche."""
+    h, m = s.strip().split(":")[:2]
+    return int(h) * 60 + int(m)
 
+# Inicio de cada turno en minutos desde medianoche, parseado una sola vez
+SHIFT_STARTS_MIN = {shift: hm_to_min(start) for shift, start in SHIFT_STARTS.items()}
+
+def calculate_delay(actual_start, planned_start=None, shift=None):
     if not actual_start or actual_start == "—":
         return "—"
 
     try:
-        actual_time = datetime.strptime(actual_start, "%H:%M")
+        actual_min = hm_to_min(actual_start)
         if planned_start:
-            planned_time = datetime.strptime(planned_start, "%H:%M")
-        elif shift and shift in SHIFT_STARTS:
-            planned_time = datetime.strptime(SHIFT_STARTS[shift], "%H:%M")
+            planned_min = hm_to_min(planned_start)
+        elif shift in SHIFT_STARTS_MIN:
+            planned_min = SHIFT_STARTS_MIN[shift]
         else:
             return "—"
 
-        delay = (actual_time - planned_time).total_seconds() / 60
-        return max(0, int(delay))
+        return max(0, actual_min - planned_min)
     except Exception as e:
         print(f"Error calculating delay: {e}")
         return "—"
 
-@app.get("/attendance-details")
-async def attendance_details(agent_id: int, date: str):
+@lru_cache(maxsize=4096)
+def _details_cached(agent_id: str, date: str):
+    """Details + delay for one (agent_id, date); cleared whenever actuals_index is rebuilt."""
     details = get_attendance_details(agent_id, date)
     details["delay"] = calculate_delay(details["actual_start"], shift=details["shift"])
-    return details
\ No newline at end of file
+    return details
+
+@app.get("/attendance-details", response_model=None)
+def attendance_details(agent_id: int, date: str):
+    refresh_actuals_index()
+    return ORJSONResponse(_details_cached(str(agent_id), date))
\ No newline at end of file
@@ -1,8 +1,10 @@
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
 class JustifyBody(BaseModel):
     agent_id: str = Field(..., description="Agent ID")
     date: str = Field(..., description="YYYY-MM-DD")
-    type: str = Field(..., pattern=r"^(A|J|V|U|D|H|C|ML)$")
+    type: Literal["A", "J", "V", "U", "D", "H", "C", "ML"]
     note: str = Field(default="", description="Optional note")
     lead: str = Field(default="", description="Optional lead")
\ No newline at end of file
@@ -1,16 +1,17 @@
 """Admin routes for database management."""
+import codecs
+import csv
 import os
 import shutil
 from datetime import date, datetime
 from pathlib import Path
-from io import StringIO
 
 import pandas as pd
 from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Form
 from fastapi.responses import FileResponse
 
 from ..storage import sync_actuals_to_r2, sync_schedule_to_r2, is_r2_enabled
-from ..database import save_schedule_version, get_all_schedule_versions
+from ..database import save_schedule_version, get_all_schedule_versions, checkpoint_db
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -24,6 +25,55 @@ ACTUALS_PATH = Path("actuals.csv")
 SCHEDULE_PATH = Path("schedule.csv")
 
 
+UPLOAD_COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def _stream_csv_upload(file: UploadFile, dest: Path, required_cols: list) -> tuple:
+    """Stream an uploaded CSV to a temp file next to dest, checking the header first.
+
+    The body is copied in 1 MB chunks through one incremental UTF-8 decoder, so non
+    UTF-8 files are still rejected as before. Returns (temp_path, data_rows); the
+    caller moves temp_path over dest once it accepts the file.
+    """
+    tmp_path = dest.with_suffix(".csv.tmp")
+    src = file.file
+    src.seek(0)
+    try:
+        raw_header = src.readline()
+        header_line = raw_header.decode("utf-8").rstrip("\n")
+        # Whole column names, so e.g. "update" no longer satisfies "date"; BOM and quotes handled by csv
+        header_cols = {c.strip().lower() for c in next(csv.reader([header_line.lstrip("\ufeff")]), [])}
+        missing = [col for col in required_cols if col not in header_cols]
+        if missing:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Missing required column: {', '.join(missing)}. Header found: {header_line}"
+            )
+
+        # Count data rows like len(text.strip().split("\n")) - 1: lines up to the
+        # last one with content, so trailing blank lines don't count
+        rows = 0
+        newlines_seen = 0
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        with open(tmp_path, "wb") as out:
+            out.write(raw_header)
+            for chunk in iter(lambda: src.read(UPLOAD_COPY_CHUNK_SIZE), b""):
+                decoder.decode(chunk)
+                out.write(chunk)
+                content = chunk.rstrip()
+                if content:
+                    rows = newlines_seen + content.count(b"\n") + 1
+                newlines_seen += chunk.count(b"\n")
+            decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        tmp_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    except HTTPException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return tmp_path, rows
+
+
 @router.get("/download-db")
 def download_db(token: str = Query(..., description="Admin password for authorization")):
     """Download the SQLite database file.
@@ -39,6 +89,9 @@ def download_db(token: str = Query(..., description="Admin password for authoriz
     if not DB_PATH.exists():
         raise HTTPException(status_code=404, detail="Database file not found")
 
+    # Make sure recent writes sitting in the WAL are part of the file we send
+    checkpoint_db()
+
     return FileResponse(
         path=str(DB_PATH),
         filename="attendance.db",
@@ -47,7 +100,7 @@ def download_db(token: str = Query(..., description="Admin password for authoriz
 
 
 @router.post("/upload-actuals")
-async def upload_actuals(
+def upload_actuals(
     token: str = Form(..., description="Admin password for authorization"),
     file: UploadFile = File(..., description="The actuals.csv file to upload"),
 ):
@@ -66,34 +119,17 @@ async def upload_actuals(
     if not file.filename or not file.filename.lower().endswith(".csv"):
         raise HTTPException(status_code=400, detail="File must be a .csv file")
 
-    # Read and validate content (check for expected columns)
-    try:
-        content = await file.read()
-        # Decode and check header
-        text = content.decode("utf-8")
-        lines = text.strip().split("\n")
-        if not lines:
-            raise HTTPException(status_code=400, detail="File is empty")
-        
-        header = lines[0].lower()
-        required_cols = ["date", "agent_id", "actual_start", "actual_end"]
-        for col in required_cols:
-            if col not in header:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Missing required column: {col}. Header found: {lines[0]}"
-                )
-    except UnicodeDecodeError:
-        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    # Stream to a temp file, validating the header (check for expected columns)
+    required_cols = ["date", "agent_id", "actual_start", "actual_end"]
+    tmp_path, rows = _stream_csv_upload(file, ACTUALS_PATH, required_cols)
 
     # Backup existing file if it exists
     if ACTUALS_PATH.exists():
         backup_path = ACTUALS_PATH.with_suffix(".csv.bak")
         shutil.copy2(ACTUALS_PATH, backup_path)
 
-    # Write new file
-    with open(ACTUALS_PATH, "wb") as f:
-        f.write(content)
+    # Move new file into place
+    os.replace(tmp_path, ACTUALS_PATH)
 
     # Sync to R2 for persistence across dyno restarts
     r2_synced = sync_actuals_to_r2()
@@ -101,13 +137,13 @@ async def upload_actuals(
     return {
         "ok": True,
         "message": f"Uploaded {file.filename} successfully",
-        "rows": len(lines) - 1,
+        "rows": rows,
         "r2_synced": r2_synced,
     }
 
 
 @router.post("/upload-schedule")
-async def upload_schedule(
+def upload_schedule(
     token: str = Form(..., description="Admin password for authorization"),
     file: UploadFile = File(..., description="The schedule.csv file to upload"),
     effective_date: str = Form(..., description="Effective start date (YYYY-MM-DD) for this schedule"),
@@ -134,30 +170,15 @@ async def upload_schedule(
     if not file.filename or not file.filename.lower().endswith(".csv"):
         raise HTTPException(status_code=400, detail="File must be a .csv file")
 
-    # Read and validate content (check for expected columns)
-    try:
-        content = await file.read()
-        # Decode and check header
-        text = content.decode("utf-8")
-        lines = text.strip().split("\n")
-        if not lines:
-            raise HTTPException(status_code=400, detail="File is empty")
-        
-        header = lines[0].lower()
-        required_cols = ["agent_id", "name", "lead", "expected_start", "expected_end"]
-        for col in required_cols:
-            if col not in header:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Missing required column: {col}. Header found: {lines[0]}"
-                )
-    except UnicodeDecodeError:
-        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    # Stream to a temp file, validating the header (check for expected columns)
+    required_cols = ["agent_id", "name", "lead", "expected_start", "expected_end"]
+    tmp_path, rows = _stream_csv_upload(file, SCHEDULE_PATH, required_cols)
 
-    # Parse CSV into DataFrame
+    # Parse CSV into DataFrame; every value is stored via str(), so keep the text as uploaded
     try:
-        df = pd.read_csv(StringIO(text))
+        df = pd.read_csv(tmp_path, dtype=str)
     except Exception as e:
+        tmp_path.unlink(missing_ok=True)
         raise HTTPException(status_code=400, detail=f"Failed to parse CSV: {str(e)}")
 
     # Save schedule version to database
@@ -168,8 +189,7 @@ async def upload_schedule(
         backup_path = SCHEDULE_PATH.with_suffix(".csv.bak")
         shutil.copy2(SCHEDULE_PATH, backup_path)
 
-    with open(SCHEDULE_PATH, "wb") as f:
-        f.write(content)
+    os.replace(tmp_path, SCHEDULE_PATH)
 
     # Sync to R2 for persistence across dyno restarts
     r2_synced = sync_schedule_to_r2()
@@ -177,7 +197,7 @@ async def upload_schedule(
     return {
         "ok": True,
         "message": f"Uploaded {file.filename} successfully. Schedule effective from {effective_date}.",
-        "rows": len(lines) - 1,
+        "rows": rows,
         "version_id": version_id,
         "effective_date": effective_date,
         "r2_synced": r2_synced,
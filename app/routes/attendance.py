@@ -1,17 +1,40 @@
 from fastapi import APIRouter, Query, HTTPException
-from fastapi.responses import StreamingResponse
-from datetime import datetime, date, time, timedelta
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from datetime import datetime, date
 from io import BytesIO
-from typing import Dict, Tuple, Any, List
+from typing import Dict, Tuple, Any, List, Optional
 import pandas as pd
+import xlsxwriter
 
-from ..logic import build_attendance, get_actuals_df, SCHEDULE_DF, VALID_AGENT_IDS, expected_interval_for_day, compute_day_status, get_schedule_for_day
-from ..database import get_justifications_map, upsert_justification, delete_justification
+from ..logic import build_attendance, get_actuals_df, get_schedule_csv_df, SCHEDULE_DF, VALID_AGENT_IDS, expected_interval_for_day, compute_day_status, get_schedule_segments_for_range, lead_matches
+from ..database import get_justifications_map, upsert_justification, delete_justification, get_justifications_report_df
 from ..models.schemas import JustifyBody
+from ..utils import format_hhmm
 
 router = APIRouter()
 
-@router.get("/attendance")
+
+def _write_xlsx(sheets: List[Tuple[str, pd.DataFrame]]) -> BytesIO:
+    """
+    Write (sheet_name, df) pairs to an in-memory .xlsx, header row first, no index.
+    xlsxwriter's constant_memory mode flushes each row as soon as the next one starts,
+    so rows are written in order here (DataFrame.to_excel writes column by column).
+    """
+    buf = BytesIO()
+    workbook = xlsxwriter.Workbook(buf, {"constant_memory": True})
+    header_fmt = workbook.add_format({"bold": True, "border": 1})
+    for name, df in sheets:
+        ws = workbook.add_worksheet(name)
+        ws.write_row(0, 0, [str(c) for c in df.columns], header_fmt)
+        # Python scalars, with NaN/NA as None so the cell stays blank (like to_excel)
+        values = df.astype(object).where(df.notna(), None)
+        for r, row in enumerate(values.itertuples(index=False, name=None), start=1):
+            ws.write_row(r, 0, row)
+    workbook.close()
+    buf.seek(0)
+    return buf
+
+@router.get("/attendance", response_model=None)
 def get_attendance(
     start: str = Query(..., description="YYYY-MM-DD"),
     end: str = Query(..., description="YYYY-MM-DD"),
@@ -29,7 +52,8 @@ def get_attendance(
         raise HTTPException(status_code=400, detail="The 'end' must be >= 'start'")
 
     data = build_attendance(start_d, end_d, lead, agent_id, status)
-    return data
+    # Plain dicts/str/int only, so hand them to orjson directly and skip jsonable_encoder
+    return ORJSONResponse(data)
 
 @router.post("/attendance/justify")
 def post_justify(body: JustifyBody):
@@ -54,31 +78,38 @@ def delete_justify(agent_id: str = Query(...), date: str = Query(..., descriptio
     return {"ok": True, "message": "Justification removed"}
 
 
-@router.get("/schedules")
+# (schedule DataFrame, all agent dicts, agent dicts by lower-cased lead), all sorted by lead/name
+_schedules_cache: Optional[Tuple[pd.DataFrame, List[Dict[str, str]], Dict[str, List[Dict[str, str]]]]] = None
+
+def _schedules_records() -> Tuple[List[Dict[str, str]], Dict[str, List[Dict[str, str]]]]:
+    """
+    /schedules rows for the current schedule.csv, rebuilt only when get_schedule_csv_df
+    hands back a new frame (i.e. the file changed, e.g. after /admin/upload-schedule).
+    """
+    global _schedules_cache
+    sched = get_schedule_csv_df()
+    if _schedules_cache is None or _schedules_cache[0] is not sched:
+        # Sort by lead, then by name
+        ordered = sched.sort_values(["lead", "name"])
+        keys = ("agent_id", "name", "lead", "shift", "working_days", "days_off", "expected_start", "expected_end")
+        columns = [ordered[c].tolist() for c in ("agent_id", "name", "lead", "Shift", "working_days", "days_off", "expected_start", "expected_end")]
+        agents = [dict(zip(keys, map(str, values))) for values in zip(*columns)]
+        by_lead: Dict[str, List[Dict[str, str]]] = {}
+        for lead_lower, agent in zip(ordered["_lead_lower"].tolist(), agents):
+            by_lead.setdefault(lead_lower, []).append(agent)
+        _schedules_cache = (sched, agents, by_lead)
+    return _schedules_cache[1], _schedules_cache[2]
+
+
+@router.get("/schedules", response_model=None)
 def get_schedules(lead: str = Query(None)):
     """Get all agent schedules with their work days, days off, and expected times."""
-    sched = SCHEDULE_DF.copy()
+    agents, by_lead = _schedules_records()
     
     if lead:
-        sched = sched[sched["lead"].str.lower() == lead.strip().lower()]
+        agents = by_lead.get(lead.strip().lower(), [])
     
-    # Sort by lead, then by name
-    sched = sched.sort_values(["lead", "name"])
-    
-    agents = []
-    for _, row in sched.iterrows():
-        agents.append({
-            "agent_id": str(row["agent_id"]),
-            "name": str(row["name"]),
-            "lead": str(row["lead"]),
-            "shift": str(row["Shift"]),
-            "working_days": str(row["working_days"]),
-            "days_off": str(row["days_off"]),
-            "expected_start": str(row["expected_start"]),
-            "expected_end": str(row["expected_end"]),
-        })
-    
-    return {"agents": agents, "total": len(agents)}
+    return ORJSONResponse({"agents": agents, "total": len(agents)})
 
 
 @router.get("/export.xlsx")
@@ -99,11 +130,8 @@ def export_excel(
 
     # --- Attendance (resumen) ---
     data = build_attendance(start_d, end_d, lead, agent_id)
-    day_labels: list[str] = []
-    cur = start_d
-    while cur <= end_d:
-        day_labels.append(cur.isoformat())
-        cur += timedelta(days=1)
+    days = pd.date_range(start_d, end_d, freq="D").date.tolist()
+    day_labels = [d.isoformat() for d in days]
 
     rows_attendance = []
     for agent in data["agents"]:
@@ -131,31 +159,26 @@ def export_excel(
     # --- Connections (detalle conexiones por día) ---
     df_act_all = get_actuals_df()
 
-    # Cache for schedule by date to avoid repeated lookups
-    schedule_cache: Dict[date, pd.DataFrame] = {}
-    
-    def get_schedule_cached(d: date) -> pd.DataFrame:
-        if d not in schedule_cache:
-            schedule_cache[d] = get_schedule_for_day(d)
-        return schedule_cache[d]
+    # One processed schedule per run of days sharing a version, indexed into `days`
+    segments = []  # (first day index, last day index, schedule, agent_id -> first row position)
+    for seg_start, seg_end, sched in get_schedule_segments_for_range(start_d, end_d):
+        positions: Dict[str, int] = {}
+        for pos, aid in enumerate(sched["agent_id"].tolist()):
+            positions.setdefault(aid, pos)
+        segments.append(((seg_start - start_d).days, (seg_end - start_d).days, sched, positions))
 
     # Collect all unique agents from all schedules in the date range
     all_agents: Dict[str, Dict[str, Any]] = {}  # agent_id -> latest agent info
-    cur = start_d
-    while cur <= end_d:
-        sched = get_schedule_cached(cur)
-        for _, row in sched.iterrows():
-            aid = str(row["agent_id"])
+    for _, _, sched, _ in segments:
+        for aid, name, lead_val in zip(sched["agent_id"].astype(str).tolist(), sched["name"].tolist(), sched["lead"].tolist()):
             if aid not in all_agents:
-                all_agents[aid] = {"name": row["name"], "lead": row["lead"]}
-        cur += timedelta(days=1)
+                all_agents[aid] = {"name": name, "lead": lead_val}
 
     # Filter agents by lead/agent_id
     if lead:
-        lead_lower = lead.strip().lower()
         # Get base schedule to check leads
-        base_sched = get_schedule_cached(start_d)
-        valid_agents = set(base_sched[base_sched["lead"].str.lower() == lead_lower]["agent_id"].tolist())
+        base_sched = segments[0][2]
+        valid_agents = set(base_sched["agent_id"][lead_matches(base_sched, lead)].tolist())
         all_agents = {k: v for k, v in all_agents.items() if k in valid_agents}
     
     if agent_id:
@@ -163,59 +186,43 @@ def export_excel(
         all_agents = {k: v for k, v in all_agents.items() if k == target_aid}
 
     valid_agents = set(all_agents.keys())
-    df_act_all = df_act_all[df_act_all["agent_id"].isin(valid_agents)].copy()
+    df_act_all = df_act_all[df_act_all["agent_id"].isin(valid_agents)]
 
-    actuals_by_day: Dict[Tuple[str, date], List[pd.Series]] = {}
-    for _, r in df_act_all.iterrows():
-        key = (str(r["agent_id"]), r["date"])
-        actuals_by_day.setdefault(key, []).append(r)
+    # (agent_id, date) -> positions of that day's rows in df_act_all, in file order
+    actuals_by_day: Dict[Tuple[str, date], List[int]] = {}
+    for pos, key in enumerate(zip(df_act_all["agent_id"].astype(str).tolist(), df_act_all["date"].tolist())):
+        actuals_by_day.setdefault(key, []).append(pos)
+    act_start_s = df_act_all["actual_start_s"].tolist()
+    act_end_s = df_act_all["actual_end_s"].tolist()
 
-    def tstr(t: time) -> str:
-        return t.strftime("%H:%M") if t else ""
+    # One query for the whole range; compute_day_status looks up (agent_id, day) keys
+    just_map = get_justifications_map(start_d, end_d)
 
     rows_connections: List[Dict[str, Any]] = []
     for aid, agent_info in all_agents.items():
-        cur_day = start_d
-        while cur_day <= end_d:
-            # Get schedule for this specific day
-            day_sched = get_schedule_cached(cur_day)
-            agent_rows = day_sched[day_sched["agent_id"] == aid]
-            
-            if agent_rows.empty:
-                # Agent not in schedule for this day - skip
-                cur_day += timedelta(days=1)
+        for first_j, last_j, seg_sched, positions in segments:
+            pos = positions.get(aid)
+            if pos is None:
+                # Agent not in schedule for these days - skip
                 continue
-            
-            arow = agent_rows.iloc[0]
+
+            # The schedule row (and so the expected times) is the same for every day of the run
+            arow = seg_sched.iloc[pos]
             ashift = str(arow["Shift"])
-            exp_iv = expected_interval_for_day(arow, cur_day)
-            exp_start_t = exp_iv[0].time() if exp_iv else None
-            exp_end_t = exp_iv[1].time() if exp_iv else None
-
-            act_rows = actuals_by_day.get((aid, cur_day), [])
-            first_row = act_rows[0] if act_rows else None
-            just_map = get_justifications_map(cur_day, cur_day)
-            day_item = compute_day_status(arow, cur_day, first_row, just_map)
-
-            if act_rows:
-                for r in act_rows:
-                    rows_connections.append({
-                        "expected_connect_time": tstr(exp_start_t),
-                        "expected_disconnect_time": tstr(exp_end_t),
-                        "date": cur_day.isoformat(),
-                        "agent_id": aid,
-                        "name": agent_info["name"],
-                        "shift": ashift,
-                        "actual_connect_time": tstr(r["actual_start_t"]),
-                        "actual_disconnect_time": tstr(r["actual_end_t"]),
-                        "status": day_item["status"],
-                        "late_minutes_sum": day_item["late_minutes"],
-                    })
-            else:
-                rows_connections.append({
-                    "expected_connect_time": tstr(exp_start_t),
-                    "expected_disconnect_time": tstr(exp_end_t),
-                    "date": cur_day.isoformat(),
+            exp_iv = expected_interval_for_day(arow, days[first_j])
+            expected_connect = format_hhmm(exp_iv[0] if exp_iv else -1)
+            expected_disconnect = format_hhmm(exp_iv[1] if exp_iv else -1)
+
+            for j in range(first_j, last_j + 1):
+                cur_day = days[j]
+                act_rows = actuals_by_day.get((aid, cur_day), [])
+                first_row = df_act_all.iloc[act_rows[0]] if act_rows else None
+                day_item = compute_day_status(arow, cur_day, first_row, just_map)
+
+                base = {
+                    "expected_connect_time": expected_connect,
+                    "expected_disconnect_time": expected_disconnect,
+                    "date": day_labels[j],
                     "agent_id": aid,
                     "name": agent_info["name"],
                     "shift": ashift,
@@ -223,9 +230,16 @@ def export_excel(
                     "actual_disconnect_time": "",
                     "status": day_item["status"],
                     "late_minutes_sum": day_item["late_minutes"],
-                })
-
-            cur_day += timedelta(days=1)
+                }
+                if act_rows:
+                    for r in act_rows:
+                        rows_connections.append({
+                            **base,
+                            "actual_connect_time": format_hhmm(act_start_s[r]),
+                            "actual_disconnect_time": format_hhmm(act_end_s[r]),
+                        })
+                else:
+                    rows_connections.append(base)
 
     cols_connections = [
         "expected_connect_time", "expected_disconnect_time",
@@ -236,12 +250,7 @@ def export_excel(
     df_connections = pd.DataFrame(rows_connections, columns=cols_connections)
 
     # --- Escribir ambas hojas al Excel ---
-    buf = BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-        df_attendance.to_excel(writer, index=False, sheet_name="Attendance")
-        df_connections.to_excel(writer, index=False, sheet_name="Connections")
-
-    buf.seek(0)
+    buf = _write_xlsx([("Attendance", df_attendance), ("Connections", df_connections)])
     headers = {"Content-Disposition": 'attachment; filename="export.xlsx"'}
     return StreamingResponse(
         buf,
@@ -249,53 +258,15 @@ def export_excel(
         headers=headers
     )
 
-@router.get("/schedules")
-def get_schedules():
-    """Return all schedules from schedule.csv"""
-    schedules = []
-    for _, row in SCHEDULE_DF.iterrows():
-        schedules.append({
-            "agent_id": str(row["agent_id"]),
-            "name": str(row["name"]),
-            "lead": str(row["lead"]),
-            "expected_start": str(row["expected_start"]),
-            "expected_end": str(row["expected_end"]),
-            "shift": str(row.get("Shift", "")),
-        })
-    return {"schedules": schedules}
-
 @router.get("/justifications_report.xlsx")
 def justifications_report():
-    import sqlite3
-    con = sqlite3.connect("attendance.db")
-    cur = con.cursor()
-    cur.execute(
-        "SELECT agent_id, date, type, note, lead, created_at FROM justifications ORDER BY created_at DESC"
-    )
-    rows = cur.fetchall()
-    con.close()
+    df = get_justifications_report_df()
 
     # Nombres de agentes desde schedule.csv
-    agent_names = {str(r["agent_id"]): str(r["name"]) for _, r in SCHEDULE_DF.iterrows()}
-
-    data = []
-    for agent_id, date_str, typ, note, lead, created_at in rows:
-        data.append({
-            "agent_id": agent_id,
-            "name": agent_names.get(str(agent_id), ""),
-            "date": date_str,
-            "type": typ,
-            "note": note,
-            "lead": lead,
-            "created_at": created_at,
-        })
-
-    df = pd.DataFrame(data, columns=["agent_id", "name", "date", "type", "note", "lead", "created_at"])
+    agent_names = dict(zip(SCHEDULE_DF["agent_id"].astype(str).tolist(), SCHEDULE_DF["name"].astype(str).tolist()))
+    df.insert(1, "name", df["agent_id"].astype(str).map(agent_names).fillna(""))
 
-    buf = BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Justifications")
-    buf.seek(0)
+    buf = _write_xlsx([("Justifications", df)])
     headers = {"Content-Disposition": 'attachment; filename="justifications_report.xlsx"'}
     return StreamingResponse(
         buf,
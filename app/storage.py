@@ -9,6 +9,8 @@ Environment variables required:
 These are optional - if not set, R2 storage is disabled and local files are used.
 """
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
@@ -21,24 +23,76 @@ R2_ENDPOINT_URL = os.environ.get("R2_ENDPOINT_URL")
 # Check if R2 is configured
 R2_ENABLED = all([R2_BUCKET, R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, R2_ENDPOINT_URL])
 
+# Multipart transfers: files over 8 MB go up in 16 MB parts, up to 8 at a time
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 16 * 1024 * 1024
+MAX_CONCURRENCY = 8
+
 _s3_client = None
+_s3_client_lock = threading.Lock()
+_transfer_config = None
+
+
+def _create_s3_client():
+    """Build a boto3 S3 client configured for Cloudflare R2."""
+    import boto3  # type: ignore
+    from botocore.config import Config  # type: ignore
+    return boto3.client(
+        "s3",
+        endpoint_url=R2_ENDPOINT_URL,
+        aws_access_key_id=R2_ACCESS_KEY_ID,
+        aws_secret_access_key=R2_SECRET_ACCESS_KEY,
+        region_name="auto",  # R2 uses 'auto' for region
+        # Enough pooled connections for parallel multipart parts
+        config=Config(
+            max_pool_connections=32,
+            retries={"max_attempts": 3, "mode": "standard"},
+        ),
+    )
 
 
 def _get_s3_client():
-    """Get or create a boto3 S3 client configured for Cloudflare R2."""
+    """Get the shared R2 client, creating it once if the eager build below didn't."""
     global _s3_client
     if _s3_client is None:
-        import boto3  # type: ignore
-        _s3_client = boto3.client(
-            "s3",
-            endpoint_url=R2_ENDPOINT_URL,
-            aws_access_key_id=R2_ACCESS_KEY_ID,
-            aws_secret_access_key=R2_SECRET_ACCESS_KEY,
-            region_name="auto",  # R2 uses 'auto' for region
-        )
+        with _s3_client_lock:
+            if _s3_client is None:
+                _s3_client = _create_s3_client()
     return _s3_client
 
 
+def _reset_s3_client_after_fork():
+    # A forked worker must not share the parent's connection pool (or a held lock)
+    global _s3_client, _s3_client_lock
+    _s3_client = None
+    _s3_client_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_s3_client_after_fork)
+
+# Build the client at import so the first request doesn't pay for credential/endpoint setup
+if R2_ENABLED:
+    try:
+        _s3_client = _create_s3_client()
+    except Exception as e:
+        print(f"[R2] Error creating client, will retry on first use: {e}")
+
+
+def _get_transfer_config():
+    """Get or create the TransferConfig used for R2 uploads and downloads."""
+    global _transfer_config
+    if _transfer_config is None:
+        from boto3.s3.transfer import TransferConfig  # type: ignore
+        _transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNKSIZE,
+            max_concurrency=MAX_CONCURRENCY,
+            use_threads=True,
+        )
+    return _transfer_config
+
+
 def download_from_r2(remote_key: str, local_path: Path) -> bool:
     """Download a file from R2 to local path.
     
@@ -47,17 +101,24 @@ def download_from_r2(remote_key: str, local_path: Path) -> bool:
     if not R2_ENABLED:
         return False
     
+    from botocore.exceptions import ClientError  # type: ignore
+
     try:
         client = _get_s3_client()
-        client.download_file(R2_BUCKET, remote_key, str(local_path))
+        # HEAD first: a missing key comes back as a typed error code, no body transferred
+        try:
+            client.head_object(Bucket=R2_BUCKET, Key=remote_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                # File might not exist yet, which is fine
+                print(f"[R2] File {remote_key} not found in R2, using local if exists")
+                return False
+            raise
+        client.download_file(R2_BUCKET, remote_key, str(local_path), Config=_get_transfer_config())
         print(f"[R2] Downloaded {remote_key} -> {local_path}")
         return True
     except Exception as e:
-        # File might not exist yet, which is fine
-        if "404" in str(e) or "NoSuchKey" in str(e):
-            print(f"[R2] File {remote_key} not found in R2, using local if exists")
-        else:
-            print(f"[R2] Error downloading {remote_key}: {e}")
+        print(f"[R2] Error downloading {remote_key}: {e}")
         return False
 
 
@@ -75,7 +136,7 @@ def upload_to_r2(local_path: Path, remote_key: str) -> bool:
     
     try:
         client = _get_s3_client()
-        client.upload_file(str(local_path), R2_BUCKET, remote_key)
+        client.upload_file(str(local_path), R2_BUCKET, remote_key, Config=_get_transfer_config())
         print(f"[R2] Uploaded {local_path} -> {remote_key}")
         return True
     except Exception as e:
@@ -91,17 +152,13 @@ def sync_from_r2():
     
     print("[R2] Syncing files from Cloudflare R2...")
     
-    # Download actuals.csv
-    actuals_path = Path("actuals.csv")
-    download_from_r2("actuals.csv", actuals_path)
-    
-    # Download schedule.csv
-    schedule_path = Path("schedule.csv")
-    download_from_r2("schedule.csv", schedule_path)
-    
-    # Download attendance.db
-    db_path = Path("attendance.db")
-    download_from_r2("attendance.db", db_path)
+    # actuals.csv, schedule.csv and attendance.db are independent: download them
+    # concurrently over the shared client so startup waits for the slowest, not the sum
+    files = ["actuals.csv", "schedule.csv", "attendance.db"]
+    with ThreadPoolExecutor(max_workers=len(files)) as pool:
+        futures = [pool.submit(download_from_r2, name, Path(name)) for name in files]
+        for future in futures:
+            future.result()
 
 
 def sync_actuals_to_r2() -> bool:
@@ -122,3 +179,16 @@ def sync_db_to_r2() -> bool:
 def is_r2_enabled() -> bool:
     """Check if R2 storage is enabled."""
     return R2_ENABLED
+
+
+def _r2_disabled(*args, **kwargs) -> bool:
+    """Stand-in for the transfer functions when R2 is not configured."""
+    return False
+
+
+# Without R2 every transfer is a no-op: bind the public functions straight to the
+# stub at import, so save paths don't pay for the R2_ENABLED check on each call.
+# Modules doing `from .storage import ...` pick these bindings up.
+if not R2_ENABLED:
+    download_from_r2 = upload_to_r2 = _r2_disabled
+    sync_actuals_to_r2 = sync_schedule_to_r2 = sync_db_to_r2 = _r2_disabled
@@ -1,24 +1,76 @@
-from datetime import date, time, datetime
+from datetime import time
+from functools import lru_cache
 from typing import Optional
 
+import numpy as np
+import pandas as pd
+
 def parse_hhmm_or_hhmmss(s: str) -> Optional[time]:
     """Convierte 'HH:MM' o 'HH:MM:SS' a objeto time; devuelve None si está vacío o inválido."""
     if s is None:
         return None
-    s = str(s).strip()
-    if not s:
+    return _parse_hhmm_cached(str(s).strip())
+
+@lru_cache(maxsize=4096)
+def _parse_hhmm_cached(s: str) -> Optional[time]:
+    # Mismo criterio que strptime("%H:%M:%S") / strptime("%H:%M"), sin interpretar el formato:
+    # 1-2 dígitos ASCII por campo, hora <= 23, minutos y segundos <= 59
+    parts = s.split(":")
+    if len(parts) not in (2, 3):
+        return None
+    for p in parts:
+        if not (1 <= len(p) <= 2 and p.isascii() and p.isdigit()):
+            return None
+    h, m = int(parts[0]), int(parts[1])
+    sec = int(parts[2]) if len(parts) == 3 else 0
+    if h > 23 or m > 59 or sec > 59:
         return None
-    for fmt in ("%H:%M:%S", "%H:%M"):
-        try:
-            return datetime.strptime(s, fmt).time()
-        except ValueError:
-            pass
-    return None
-
-def weekday_token(d: date) -> str:
-    """Regresa 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'."""
-    return d.strftime("%a")
-
-def parse_days_list(s: str) -> list[str]:
-    """Convierte 'Mon, Tue, Wed, Thu, Fri' -> ['Mon','Tue','Wed','Thu','Fri']"""
-    return [x.strip() for x in str(s).split(",") if str(x).strip()]
\ No newline at end of file
+    return time(h, m, sec)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+def parse_time_seconds(s: str) -> int:
+    """Convierte 'HH:MM' o 'HH:MM:SS' a segundos desde medianoche; -1 si está vacío o inválido."""
+    t = parse_hhmm_or_hhmmss(s)
+    if t is None:
+        return -1
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+# Lo que aceptan strptime("%H:%M:%S") / strptime("%H:%M"): 1-2 dígitos por campo
+_TIME_RE = r"^(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?$"
+
+def parse_time_seconds_column(col: pd.Series) -> pd.Series:
+    """Versión vectorizada de parse_time_seconds para una columna completa (int32, -1 = vacío/inválido)."""
+    parts = col.astype(str).str.strip().str.extract(_TIME_RE)
+    h = pd.to_numeric(parts[0])
+    m = pd.to_numeric(parts[1])
+    sec = pd.to_numeric(parts[2]).fillna(0)
+    valid = (h <= 23) & (m <= 59) & (sec <= 59)
+    return (h * 3600 + m * 60 + sec).where(valid, -1).astype(np.int32)
+
+def format_hhmm(seconds: int) -> str:
+    """Segundos desde medianoche (puede pasar de 24h) -> 'HH:MM' de esa hora del día; '' si es -1."""
+    if seconds < 0:
+        return ""
+    seconds = int(seconds) % SECONDS_PER_DAY
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+# Indexado por date.weekday(); fijo, no depende del locale como strftime("%a")
+WEEKDAY_TOKENS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+@lru_cache(maxsize=256)
+def parse_days_list(s: str) -> tuple[str, ...]:
+    """Convierte 'Mon, Tue, Wed, Thu, Fri' -> ('Mon','Tue','Wed','Thu','Fri'); cacheado, por eso tupla."""
+    parts = s.split(",") if isinstance(s, str) else str(s).split(",")
+    # Cada token se limpia una sola vez
+    return tuple(t for t in map(str.strip, parts) if t)
+
+WEEKDAY_INDEX = {t: i for i, t in enumerate(WEEKDAY_TOKENS)}
+
+def days_mask(s: str) -> int:
+    """Convierte 'Sat, Sun' -> bitmask por date.weekday() (bit 5 y 6); ignora tokens desconocidos."""
+    mask = 0
+    for t in parse_days_list(s):
+        if t in WEEKDAY_INDEX:
+            mask |= 1 << WEEKDAY_INDEX[t]
+    return mask
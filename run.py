@@ -2,100 +2,135 @@
 """
 Workaround script to run the attendance tracker application.
 Since there seems to be an issue with uvicorn HTTP server,
-this script uses FastAPI's TestClient to verify functionality.
+this script drives the app in-process (httpx.AsyncClient over ASGITransport)
+to verify functionality.
+
+Profiling: with PROFILING=1 (needs `pip install pyinstrument`), any request with
+?profile=1 returns a pyinstrument HTML report instead of its normal response, e.g.
+    PROFILING=1 uvicorn run:app --port 8000
+    open http://127.0.0.1:8000/attendance?start=2026-01-01&end=2026-01-31&profile=1
 """
 
 from app.main import app
-from fastapi.testclient import TestClient
-import json
+import asyncio
+import httpx
+import os
+
+if os.environ.get("PROFILING") == "1":
+    # Optional dev dependency, only imported when profiling is switched on
+    from pyinstrument import Profiler
+    from fastapi import Request
+    from fastapi.responses import HTMLResponse
 
-def main():
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        if not request.query_params.get("profile"):
+            return await call_next(request)
+        profiler = Profiler(interval=0.001, async_mode="enabled")
+        profiler.start()
+        await call_next(request)
+        profiler.stop()
+        return HTMLResponse(profiler.output_html())
+
+async def main():
     print("=== Attendance Tracker Test ===")
     print("Testing application functionality...")
 
-    client = TestClient(app)
-
-    # Test root endpoint
-    print("\n1. Testing root endpoint...")
-    try:
-        response = client.get('/')
-        print(f"   Status: {response.status_code}")
-        if response.status_code == 200:
-            print("   ✓ Root endpoint works")
-        else:
-            print(f"   ✗ Root endpoint failed: {response.text}")
-    except Exception as e:
-        print(f"   ✗ Root endpoint error: {e}")
-
-    # Test attendance endpoint
-    print("\n2. Testing attendance endpoint...")
-    try:
-        response = client.get('/attendance?start=2026-01-01&end=2026-01-31')
-        print(f"   Status: {response.status_code}")
-        if response.status_code == 200:
-            data = response.json()
-            agents_count = len(data.get('agents', []))
-            print(f"   ✓ Attendance endpoint works - {agents_count} agents loaded")
-
-            # Check for ML status
-            ml_found = False
-            for agent in data.get('agents', []):
-                for day_data in agent.get('days', []):
-                    if day_data.get('status') == 'ML':
-                        ml_found = True
+    # ASGITransport doesn't send lifespan events: run the startup hooks (R2 sync,
+    # init_db migrations) ourselves so the checks see the same DB the server would
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        # The root and attendance checks are independent: issue them concurrently
+        root_result, attendance_result = await asyncio.gather(
+            client.get('/'),
+            client.get('/attendance?start=2026-01-01&end=2026-01-31'),
+            return_exceptions=True,
+        )
+
+        # Test root endpoint
+        print("\n1. Testing root endpoint...")
+        try:
+            if isinstance(root_result, Exception):
+                raise root_result
+            response = root_result
+            print(f"   Status: {response.status_code}")
+            if response.status_code == 200:
+                print("   ✓ Root endpoint works")
+            else:
+                print(f"   ✗ Root endpoint failed: {response.text}")
+        except Exception as e:
+            print(f"   ✗ Root endpoint error: {e}")
+
+        # Test attendance endpoint
+        print("\n2. Testing attendance endpoint...")
+        data = None
+        try:
+            if isinstance(attendance_result, Exception):
+                raise attendance_result
+            response = attendance_result
+            print(f"   Status: {response.status_code}")
+            if response.status_code == 200:
+                data = response.json()
+                agents_count = len(data.get('agents', []))
+                print(f"   ✓ Attendance endpoint works - {agents_count} agents loaded")
+
+                # Check for ML status
+                ml_found = False
+                for agent in data.get('agents', []):
+                    for day_data in agent.get('days', []):
+                        if day_data.get('status') == 'ML':
+                            ml_found = True
+                            break
+                    if ml_found:
                         break
+
                 if ml_found:
-                    break
+                    print("   ✓ ML (Medical Leave) status is working correctly!")
+                else:
+                    print("   ! ML status not found in current data (but validation allows it)")
 
-            if ml_found:
-                print("   ✓ ML (Medical Leave) status is working correctly!")
             else:
-                print("   ! ML status not found in current data (but validation allows it)")
-
-        else:
-            print(f"   ✗ Attendance endpoint failed: {response.text}")
-    except Exception as e:
-        print(f"   ✗ Attendance endpoint error: {e}")
-
-    # Test ML justification
-    print("\n3. Testing ML justification creation...")
-    try:
-        # First get an agent ID
-        response = client.get('/attendance?start=2026-01-01&end=2026-01-31')
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('agents'):
-                agent_id = data['agents'][0]['agent_id']
-                print(f"   Using agent: {agent_id}")
-
-                # Try to create an ML justification
-                justify_data = {
-                    "agent_id": agent_id,
-                    "date": "2026-01-15",
-                    "type": "ML",
-                    "note": "Test Medical Leave",
-                    "lead": "Test Lead"
-                }
-
-                response = client.post('/attendance/justify', json=justify_data)
-                print(f"   ML justification status: {response.status_code}")
-                if response.status_code == 200:
-                    print("   ✓ ML justification created successfully!")
+                print(f"   ✗ Attendance endpoint failed: {response.text}")
+        except Exception as e:
+            print(f"   ✗ Attendance endpoint error: {e}")
+
+        # Test ML justification
+        print("\n3. Testing ML justification creation...")
+        try:
+            # Agent ID from the attendance response above
+            if data is not None:
+                if data.get('agents'):
+                    agent_id = data['agents'][0]['agent_id']
+                    print(f"   Using agent: {agent_id}")
+
+                    # Try to create an ML justification
+                    justify_data = {
+                        "agent_id": agent_id,
+                        "date": "2026-01-15",
+                        "type": "ML",
+                        "note": "Test Medical Leave",
+                        "lead": "Test Lead"
+                    }
+
+                    response = await client.post('/attendance/justify', json=justify_data)
+                    print(f"   ML justification status: {response.status_code}")
+                    if response.status_code == 200:
+                        print("   ✓ ML justification created successfully!")
+                    else:
+                        print(f"   ✗ ML justification failed: {response.text}")
                 else:
-                    print(f"   ✗ ML justification failed: {response.text}")
-            else:
-                print("   ! No agents available for testing")
-    except Exception as e:
-        print(f"   ✗ ML justification error: {e}")
+                    print("   ! No agents available for testing")
+        except Exception as e:
+            print(f"   ✗ ML justification error: {e}")
 
     print("\n=== Summary ===")
     print("✓ ML status has been successfully added to the application")
     print("✓ Backend validation and logic are working correctly")
-    print("✓ TestClient confirms all functionality works")
-    print("! HTTP server has issues - use TestClient for development")
+    print("✓ In-process ASGI client confirms all functionality works")
+    print("! HTTP server has issues - use the in-process client for development")
     print("\nTo run with HTTP server, try:")
     print("  uvicorn app.main:app --host 127.0.0.1 --port 8000")
     print("Or use a different server/port if there are conflicts.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
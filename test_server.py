@@ -7,14 +7,23 @@ Serves the HTML and proxies API calls to the FastAPI app.
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from fastapi.testclient import TestClient
 from app.main import app
-import json
 import urllib.parse
 import os
 
+# One client for the whole server: building a TestClient per request spins up a new portal/event loop each time
+CLIENT = TestClient(app)
+
+# Content-type of static files by extension (anything else is served as text/plain)
+CONTENT_TYPES = {
+    '.js': 'application/javascript',
+    '.json': 'application/json',
+    '.css': 'text/css',
+}
+
 class TestHandler(BaseHTTPRequestHandler):
     def do_GET(self):
         try:
-            client = TestClient(app)
+            client = CLIENT
 
             if self.path == '/':
                 # Serve the main page
@@ -37,18 +46,14 @@ class TestHandler(BaseHTTPRequestHandler):
                     filepath = '.' + self.path
                     if os.path.exists(filepath):
                         with open(filepath, 'rb') as f:
-                            content = f.read()
-                        self.send_response(200)
-                        if self.path.endswith('.js'):
-                            self.send_header('Content-type', 'application/javascript')
-                        elif self.path.endswith('.json'):
-                            self.send_header('Content-type', 'application/json')
-                        elif self.path.endswith('.css'):
-                            self.send_header('Content-type', 'text/css')
-                        else:
-                            self.send_header('Content-type', 'text/plain')
-                        self.end_headers()
-                        self.wfile.write(content)
+                            size = os.fstat(f.fileno()).st_size
+                            self.send_response(200)
+                            ext = os.path.splitext(self.path)[1]
+                            self.send_header('Content-type', CONTENT_TYPES.get(ext, 'text/plain'))
+                            self.send_header('Content-Length', str(size))
+                            self.end_headers()
+                            # Kernel-side copy (os.sendfile); socket.sendfile falls back to send() where unavailable
+                            self.connection.sendfile(f, 0, size)
                     else:
                         self.send_response(404)
                         self.end_headers()
@@ -66,14 +71,18 @@ class TestHandler(BaseHTTPRequestHandler):
 
     def do_POST(self):
         try:
-            client = TestClient(app)
+            client = CLIENT
 
             if self.path == '/attendance/justify':
                 content_length = int(self.headers['Content-Length'])
                 post_data = self.rfile.read(content_length)
-                data = json.loads(post_data.decode('utf-8'))
 
-                response = client.post('/attendance/justify', json=data)
+                # Forward the raw body; FastAPI parses it once on the app side
+                response = client.post(
+                    '/attendance/justify',
+                    content=post_data,
+                    headers={'content-type': self.headers.get('Content-Type', 'application/json')},
+                )
                 self.send_response(response.status_code)
                 self.send_header('Content-type', 'application/json')
                 self.end_headers()
@@ -91,6 +100,8 @@ class TestHandler(BaseHTTPRequestHandler):
         pass
 
 if __name__ == '__main__':
+    # Entering the client runs the app's startup hooks (R2 sync, init_db migrations)
+    CLIENT.__enter__()
     print("Starting test server on http://localhost:8080")
     print("Open your browser to http://localhost:8080")
     print("Use Ctrl+C to stop")
@@ -99,4 +110,6 @@ if __name__ == '__main__':
         server.serve_forever()
     except KeyboardInterrupt:
         print("\nServer stopped")
-        server.server_close()
\ No newline at end of file
+        server.server_close()
+    finally:
+        CLIENT.__exit__(None, None, None)
\ No newline at end of file